@@ -0,0 +1,105 @@
+"""Load test the threadpool database path against the async path.
+
+Starts the API under uvicorn once with SWC_ASYNC_DB=false and once with
+SWC_ASYNC_DB=true, sends the same concurrent requests to both, and
+prints the throughput of each.
+
+The async path only wins at high concurrency. With the bundled database,
+2,000 requests per path and the client on the same single-CPU machine,
+three runs at each concurrency gave these requests/sec:
+
+    concurrency    threadpool    async
+              1     156 - 160    131 - 180
+              8     180 - 210    134 - 179
+             64      80 - 98     100 - 113  (the default)
+
+At 1 the two are within the noise, at 8 the threadpool is ahead, and at
+64 async is ahead in every run. Results vary by 10-20% from run to run,
+so compare several runs. At 256 the client's connections fail on that
+machine.
+
+Typical usage example:
+
+    python benchmarks/bench_async.py --concurrency 64 --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+URLS = [
+    "/v0/players/?limit=50",
+    "/v0/players/1001",
+    "/v0/performances/?limit=100",
+    "/v0/leagues/?include=teams",
+    "/v0/teams/?league_id=5001",
+    "/v0/counts/",
+]
+
+
+def start_server(port: int, use_async_db: bool,
+                 database_file: str = None) -> subprocess.Popen:
+    """Starts uvicorn in a subprocess and waits until it answers"""
+    env = dict(os.environ, SWC_ASYNC_DB=str(use_async_db).lower())
+    if database_file:
+        env["SWC_DATABASE_FILE"] = os.path.abspath(database_file)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=APP_DIR, env=env)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/")
+            return server
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+async def drive(base_url: str, concurrency: int, total: int) -> float:
+    """Sends total requests with concurrency in flight, returns requests/sec"""
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits) as client:
+        next_request = iter(range(total))
+
+        async def worker():
+            for number in next_request:
+                response = await client.get(URLS[number % len(URLS)])
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for use_async_db in (False, True):
+        server = start_server(args.port, use_async_db)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            asyncio.run(drive(base_url, args.concurrency, len(URLS) * 10))
+            throughput = asyncio.run(
+                drive(base_url, args.concurrency, args.requests))
+        finally:
+            server.terminate()
+            server.wait()
+        path = "async" if use_async_db else "threadpool"
+        print(f"{path:>10}: {throughput:8.1f} requests/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Load test every /v0 endpoint and check for regressions against a baseline.
+
+Generates a dataset with generate_data.py and loads it into its own
+database, unless one already exists there. Then it starts the API under
+uvicorn against that database and drives each endpoint in turn with
+concurrent requests. The throughput and the p50, p95 and p99 latency of
+each endpoint are written to a JSON report.
+
+When a baseline report exists, each endpoint is compared against it. The
+script exits with status 1 if any endpoint lost more than the threshold
+of its throughput, or if its latency grew by more than the threshold. The
+latency compared is p50 by default, since tail latency moves a lot from
+run to run on a shared machine; use --percentile p95 on a quiet one. Save
+a new baseline with --update-baseline after an intended change.
+
+Typical usage example:
+
+    python benchmarks/bench_load.py --multiplier 10 --concurrency 16 \
+        --report /tmp/report.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import bulk_load
+import generate_data
+import migrations
+from bench_async import APP_DIR, start_server
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+BATCH_IDS = list(range(1001, 1051))
+
+# IDs in the first rows of the generated data, which exist at any multiplier.
+# A URL is sent as a GET, and a URL with a body is sent as a JSON POST. The
+# changes feed is read from the last change date of the generated data, as
+# a client in sync sends its last watermark.
+ENDPOINTS = {
+    "health": "/",
+    "players": "/v0/players/?limit=100",
+    "players_performances": "/v0/players/?limit=20&include=performances",
+    "player": "/v0/players/1001",
+    "players_batch": "/v0/players/batch?ids=" + ",".join(
+        str(player_id) for player_id in BATCH_IDS),
+    "players_batch_post": ("/v0/players/batch", {"ids": BATCH_IDS}),
+    "players_search": "/v0/players/search?q=jos",
+    "performances": "/v0/performances/?limit=100",
+    "performances_week": "/v0/performances/?min_week=202305&max_week=202305"
+                         "&limit=100",
+    "leaderboard": "/v0/leaderboard/?min_week=202301&max_week=202310",
+    "league": "/v0/leagues/5001",
+    "leagues": "/v0/leagues/?include=teams",
+    "league_standings": "/v0/leagues/5001/standings",
+    "teams": "/v0/teams/?league_id=5001&include=players",
+    "counts": "/v0/counts/",
+    "changes": "/v0/changes/?since=2024-05-30",
+}
+
+
+def prepare_database(data_dir: str, multiplier: int, seed: int) -> str:
+    """Returns a database of generated data, creating it the first time
+    and migrating it after that"""
+    database_file = os.path.join(data_dir, f"swc_{multiplier}x_{seed}.db")
+    if not os.path.exists(database_file):
+        bulk_dir = os.path.join(data_dir, f"bulk_{multiplier}x_{seed}")
+        generate_data.generate(bulk_dir, multiplier, seed)
+        bulk_load.bulk_load(database_file, bulk_dir)
+    else:
+        migrations.migrate(database_file)
+    return database_file
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Returns a percentile of sorted values, by nearest rank"""
+    rank = max(1, round(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def drive(base_url: str, url: str, concurrency: int,
+                total: int, body: dict = None) -> dict:
+    """Sends total requests for one URL with concurrency in flight and
+    returns its throughput and latency percentiles. The requests are POSTs
+    of body when there is one, and GETs otherwise."""
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits,
+                                 timeout=60) as client:
+        next_request = iter(range(total))
+        latencies = []
+
+        async def worker():
+            for _ in next_request:
+                start = time.perf_counter()
+                if body is None:
+                    response = await client.get(url)
+                else:
+                    response = await client.post(url, json=body)
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "url": url,
+        "method": "GET" if body is None else "POST",
+        "requests": total,
+        "throughput": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+    }
+
+
+def run(database_file: str, port: int, concurrency: int, requests: int,
+        use_async_db: bool) -> dict:
+    """Runs every endpoint against one server and returns their results"""
+    server = start_server(port, use_async_db, database_file)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        results = {}
+        for name, endpoint in ENDPOINTS.items():
+            url, body = endpoint if isinstance(endpoint, tuple) else (
+                endpoint, None)
+            # warm up caches and connections before measuring
+            asyncio.run(drive(base_url, url, concurrency, concurrency, body))
+            results[name] = asyncio.run(
+                drive(base_url, url, concurrency, requests, body))
+            print(f"{name:>22}: {results[name]['throughput']:8.1f} req/s  "
+                  f"p50 {results[name]['p50_ms']:7.2f} ms  "
+                  f"p95 {results[name]['p95_ms']:7.2f} ms  "
+                  f"p99 {results[name]['p99_ms']:7.2f} ms")
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report: dict, baseline: dict, threshold: float,
+            percentile_name: str = "p50") -> list[str]:
+    """Returns a description of each regression against the baseline"""
+    latency = f"{percentile_name}_ms"
+    if report["settings"] != baseline["settings"]:
+        print(f"Warning: baseline settings {baseline['settings']} differ "
+              f"from this run's {report['settings']}")
+    regressions = []
+    for name, base in baseline["endpoints"].items():
+        result = report["endpoints"].get(name)
+        if result is None:
+            continue
+        if result["throughput"] < base["throughput"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {result['throughput']} req/s, "
+                f"baseline {base['throughput']} req/s")
+        if result[latency] > base[latency] * (1 + threshold):
+            regressions.append(
+                f"{name}: {percentile_name} {result[latency]} ms, "
+                f"baseline {base[latency]} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--multiplier", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir",
+                        default=os.path.join(tempfile.gettempdir(),
+                                             "swc_bench"))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500,
+                        help="Requests to send to each endpoint")
+    parser.add_argument("--async-db", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--report", default="bench_load_report.json")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Largest allowed change, as a fraction")
+    parser.add_argument("--percentile", choices=["p50", "p95", "p99"],
+                        default="p50",
+                        help="Latency percentile to compare")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    database_file = prepare_database(args.data_dir, args.multiplier,
+                                     args.seed)
+    report = {
+        "settings": {"multiplier": args.multiplier, "seed": args.seed,
+                     "concurrency": args.concurrency,
+                     "requests": args.requests,
+                     "async_db": args.async_db},
+        "environment": {"python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "commit": git_commit()},
+        "endpoints": run(database_file, args.port, args.concurrency,
+                         args.requests, args.async_db),
+    }
+    with open(args.report, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    print(f"Wrote {args.report}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print(f"Saved the baseline to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, skipping the comparison")
+        return
+    with open(args.baseline) as baseline_file:
+        regressions = compare(report, json.load(baseline_file),
+                              args.threshold, args.percentile)
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Benchmark offset pagination against cursor pagination.
+
+Walks the performance table page by page with both methods and prints
+the latency of pages at increasing depth. Offset pages get slower the
+deeper they are, while cursor pages should stay flat.
+
+Typical usage example:
+
+    python benchmarks/bench_pagination.py --limit 500 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import crud
+from database import SessionLocal
+from pagination import next_cursor
+
+
+def time_call(function, repeat: int):
+    """Returns the best wall time in milliseconds of several calls"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    keys = crud.performance_page_keys()
+    cursor = None
+    page = 0
+    print(f"{'page':>6} {'offset ms':>10} {'cursor ms':>10}")
+    try:
+        while True:
+            offset_ms, _ = time_call(
+                lambda: crud.get_performances(
+                    db, skip=page * args.limit, limit=args.limit),
+                args.repeat)
+            cursor_ms, rows = time_call(
+                lambda: crud.get_performances(
+                    db, limit=args.limit, cursor=cursor),
+                args.repeat)
+            print(f"{page:>6} {offset_ms:>10.2f} {cursor_ms:>10.2f}")
+            cursor = next_cursor(rows, keys, args.limit)
+            if cursor is None:
+                break
+            page += 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Microbenchmark the response serialization paths of the list endpoints.
+
+Compares loading ORM objects and serializing them the way FastAPI does for
+a response_model (validate, convert to Python, then json.dumps) against
+the fast path in main.py (rows of fields written straight to JSON bytes,
+or a cached TypeAdapter for nested lists).
+
+Typical usage example:
+
+    python benchmarks/bench_serialization.py --repeat 5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import crud
+import schemas
+from database import SessionLocal
+from main import _to_json
+
+
+def response_model_path(db, crud_function, schema, **kwargs) -> bytes:
+    rows = crud_function(db, **kwargs)
+    adapter = TypeAdapter(list[schema])
+    content = adapter.dump_python(
+        adapter.validate_python(rows, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode()
+
+
+def fast_path(db, crud_function, schema, nested: bool, **kwargs) -> bytes:
+    if nested:
+        return _to_json(crud_function(db, **kwargs), schema)
+    return _to_json(crud_function(db, fields=list(schema.model_fields), **kwargs))
+
+
+CASES = [
+    ("performances", crud.get_performances, schemas.Performance, False, {}),
+    ("players", crud.get_players, schemas.PlayerBase, False,
+     {"include_performances": False}),
+    ("players+performances", crud.get_players, schemas.Player, True, {}),
+    ("teams+players", crud.get_teams, schemas.Team, True, {}),
+]
+
+
+def best_ms(function, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"{'endpoint':>22} {'response_model ms':>18} {'fast path ms':>13}")
+        for name, crud_function, schema, nested, kwargs in CASES:
+            kwargs = dict(kwargs, limit=args.limit)
+            slow = best_ms(lambda: response_model_path(
+                db, crud_function, schema, **kwargs), args.repeat)
+            fast = best_ms(lambda: fast_path(
+                db, crud_function, schema, nested, **kwargs), args.repeat)
+            print(f"{name:>22} {slow:>18.1f} {fast:>13.1f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark concurrent readers with each SQLite profile in database.py.
+
+Copies the database, then runs several reader processes against the copy
+while one writer process keeps committing small updates, the way many
+uvicorn workers share one file with a loader job. Prints the read
+throughput of each profile. Readers on the default rollback journal have
+to wait whenever the writer commits, while WAL readers don't.
+
+Typical usage example:
+
+    python benchmarks/bench_sqlite_profile.py --readers 8 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+
+def reader(database_file: str, profile: str, seconds: float, results):
+    """Runs crud queries until time is up and reports how many finished"""
+    os.environ["SWC_DATABASE_FILE"] = database_file
+    os.environ["SWC_DB_PROFILE"] = profile
+    sys.path.insert(0, APP_DIR)
+    import crud
+    from database import SessionLocal
+
+    done = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        db = SessionLocal()
+        try:
+            crud.get_players(db, limit=50, include_performances=True)
+            crud.get_teams(db, league_id=5001)
+            crud.get_counts(db)
+        finally:
+            db.close()
+        done += 1
+    results.put(done)
+
+
+def writer(database_file: str, stop):
+    """Commits small updates in a loop until told to stop"""
+    connection = sqlite3.connect(database_file, timeout=30)
+    while not stop.is_set():
+        connection.execute(
+            "UPDATE league SET scoring_type = scoring_type WHERE league_id = 5001")
+        connection.commit()
+        time.sleep(0.001)
+    connection.close()
+
+
+def run_profile(source_file: str, profile: str, readers: int, seconds: float):
+    """Returns read throughput of one profile against a fresh copy"""
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        database_file = os.path.join(temp_dir, "fantasy_data.db")
+        shutil.copy(source_file, database_file)
+        if profile == "read":
+            # switch to WAL before the writer opens the file
+            sqlite3.connect(database_file).execute(
+                "PRAGMA journal_mode=WAL").close()
+
+        results = context.Queue()
+        stop = context.Event()
+        write_process = context.Process(
+            target=writer, args=(database_file, stop))
+        read_processes = [
+            context.Process(target=reader,
+                            args=(database_file, profile, seconds, results))
+            for _ in range(readers)
+        ]
+        write_process.start()
+        for process in read_processes:
+            process.start()
+        total = sum(results.get() for _ in read_processes)
+        for process in read_processes:
+            process.join()
+        stop.set()
+        write_process.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--database-file",
+                        default=os.path.join(APP_DIR, "fantasy_data.db"))
+    args = parser.parse_args()
+
+    for profile in ("default", "read"):
+        throughput = run_profile(
+            args.database_file, profile, args.readers, args.seconds)
+        print(f"{profile:>8}: {throughput:8.1f} reads/sec "
+              f"with {args.readers} readers and 1 writer")
+
+
+if __name__ == "__main__":
+    main()
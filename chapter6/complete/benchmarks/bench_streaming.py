@@ -0,0 +1,96 @@
+"""Benchmark the JSON list response against the NDJSON stream.
+
+Measures peak Python memory while producing every performance both ways
+in process, then time to first byte and total time of both formats
+through uvicorn.
+
+Typical usage example:
+
+    python benchmarks/bench_streaming.py --limit 20000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import httpx
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import crud
+import schemas
+from database import SessionLocal
+from bench_async import start_server
+
+performance_list = TypeAdapter(list[schemas.Performance])
+
+
+def peak_memory_mb(produce_body) -> float:
+    """Returns the peak memory traced while a body is produced"""
+    tracemalloc.start()
+    try:
+        produce_body()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def json_body(limit: int):
+    db = SessionLocal()
+    try:
+        performances = crud.get_performances(db, limit=limit)
+        return performance_list.dump_json(
+            performance_list.validate_python(performances, from_attributes=True))
+    finally:
+        db.close()
+
+
+def ndjson_body(limit: int):
+    db = SessionLocal()
+    try:
+        for performances in crud.stream_performances(db, limit=limit):
+            "".join(schemas.Performance.model_validate(performance)
+                    .model_dump_json() + "\n" for performance in performances)
+    finally:
+        db.close()
+
+
+def time_download(url: str):
+    """Returns time to first byte and total time in milliseconds"""
+    start = time.perf_counter()
+    with httpx.stream("GET", url, timeout=120) as response:
+        response.raise_for_status()
+        first_byte = None
+        for _ in response.iter_raw():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+    return first_byte * 1000, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=int, default=20000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"peak memory  json: {peak_memory_mb(lambda: json_body(args.limit)):7.1f} MB")
+    print(f"peak memory ndjson: {peak_memory_mb(lambda: ndjson_body(args.limit)):7.1f} MB")
+
+    server = start_server(args.port, use_async_db=False)
+    try:
+        for output_format in ("json", "ndjson"):
+            url = (f"http://127.0.0.1:{args.port}/v0/performances/"
+                   f"?limit={args.limit}&format={output_format}")
+            time_download(url)
+            first_byte_ms, total_ms = time_download(url)
+            print(f"{output_format:>6}: first byte {first_byte_ms:8.1f} ms, "
+                  f"total {total_ms:8.1f} ms")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Bulk loader for the files in the bulk directory
+
+Replaces the contents of the five SWC tables with the league, team,
+player, team_player and performance files, in one transaction. The files
+are streamed in batches and written with executemany. Indexes and
+triggers are dropped for the load and recreated afterwards, and the
+tables that are derived from the loaded rows are rebuilt in one pass
+each, so a load costs one sort per index instead of one index update
+per row. Rows that the files no longer have are logged in deleted_row
+for the changes feed.
+
+CSV files are read with the csv module. Parquet files need pyarrow.
+
+Typical usage example:
+
+    python bulk_load.py --bulk-dir ../../bulk --format parquet
+"""
+import argparse
+import csv
+import os
+import shutil
+import sqlite3
+import time
+from itertools import islice
+
+import models
+from database import DATABASE_FILE
+from migrations import (PLAYER_CUMULATIVE_POINTS_SELECT,
+                        PLAYER_WEEK_POINTS_SELECT, bump_table_version, migrate,
+                        row_key)
+
+BULK_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "bulk")
+
+# tables in the order they are loaded, parents first, and their files
+BULK_FILES = [
+    (models.League.__table__, "league_data"),
+    (models.Team.__table__, "team_data"),
+    (models.Player.__table__, "player_data"),
+    (models.TeamPlayer.__table__, "team_player_data"),
+    (models.Performance.__table__, "performance_data"),
+]
+
+# tables that are rebuilt from the loaded tables
+DERIVED_TABLES = ["player_week_points", "player_cumulative_points",
+                  "player_fts"]
+
+
+def read_csv(path: str, batch_size: int):
+    """Yields the column names of a CSV file, then lists of its rows"""
+    with open(path, newline="", encoding="utf-8") as csv_file:
+        reader = csv.reader(csv_file)
+        yield next(reader)
+        while batch := list(islice(reader, batch_size)):
+            yield batch
+
+
+def read_parquet(path: str, batch_size: int):
+    """Yields the column names of a Parquet file, then lists of its rows"""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    yield parquet_file.schema_arrow.names
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield list(zip(*[column.to_pylist() for column in batch.columns]))
+
+
+READERS = {"csv": read_csv, "parquet": read_parquet}
+
+
+def _schema_sql(connection: sqlite3.Connection, object_type: str) -> list:
+    """Returns the names and SQL of the indexes or triggers to recreate"""
+    tables = [table.name for table, _ in BULK_FILES] + DERIVED_TABLES
+    return connection.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = ? AND sql IS NOT NULL "
+        f"AND tbl_name IN ({', '.join('?' * len(tables))})",
+        [object_type, *tables],
+    ).fetchall()
+
+
+def _save_keys(connection: sqlite3.Connection):
+    """Copies the primary keys of the rows about to be replaced to a
+    temporary table"""
+    connection.execute(
+        "CREATE TEMP TABLE replaced_key (table_name VARCHAR NOT NULL, "
+        "row_key VARCHAR NOT NULL, PRIMARY KEY (table_name, row_key))")
+    for table, _ in BULK_FILES:
+        connection.execute(
+            f"INSERT INTO replaced_key SELECT '{table.name}', "
+            f"{row_key(table.name, table.name)} FROM {table.name}")
+
+
+def _log_deleted_rows(connection: sqlite3.Connection):
+    """Logs the saved keys that the load didn't bring back as deleted, like
+    the deleted_row triggers that are dropped for the load would"""
+    for table, _ in BULK_FILES:
+        loaded_keys = (f"SELECT '{table.name}', "
+                       f"{row_key(table.name, table.name)} FROM {table.name}")
+        connection.execute("DELETE FROM replaced_key "
+                           f"WHERE (table_name, row_key) IN ({loaded_keys})")
+        connection.execute("DELETE FROM deleted_row "
+                           f"WHERE (table_name, row_key) IN ({loaded_keys})")
+    connection.execute("INSERT OR REPLACE INTO deleted_row "
+                       "SELECT table_name, row_key, date('now') "
+                       "FROM replaced_key")
+    connection.execute("DROP TABLE replaced_key")
+
+
+def load_table(connection: sqlite3.Connection, table, rows) -> int:
+    """Inserts the rows that follow the column names, returns the count"""
+    columns = next(rows)
+    unknown = set(columns) - set(table.columns.keys())
+    if unknown:
+        raise ValueError(f"{table.name} has no columns {sorted(unknown)}")
+    insert = (
+        f"INSERT INTO {table.name} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
+    count = 0
+    for batch in rows:
+        connection.executemany(insert, batch)
+        count += len(batch)
+    return count
+
+
+def bulk_load(database_file: str = DATABASE_FILE, bulk_dir: str = BULK_DIR,
+              file_format: str = "csv", batch_size: int = 50000) -> dict:
+    """Replaces the SWC tables with the bulk files.
+
+    A database file that doesn't exist yet is created with the schema of
+    the bundled database, and an existing one is migrated first. Returns
+    the number of rows loaded into each table.
+    """
+    if not os.path.exists(database_file):
+        shutil.copy(DATABASE_FILE, database_file)
+    migrate(database_file)
+    read_rows = READERS[file_format]
+    connection = sqlite3.connect(database_file, isolation_level=None)
+    try:
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.execute("PRAGMA cache_size = -262144")
+        connection.execute("PRAGMA temp_store = MEMORY")
+        connection.execute("BEGIN")
+        try:
+            indexes = _schema_sql(connection, "index")
+            triggers = _schema_sql(connection, "trigger")
+            for name, _ in triggers:
+                connection.execute(f"DROP TRIGGER {name}")
+            for name, _ in indexes:
+                connection.execute(f"DROP INDEX {name}")
+            _save_keys(connection)
+            connection.execute("DELETE FROM player_cumulative_points")
+            connection.execute("DELETE FROM player_week_points")
+            connection.execute(
+                "INSERT INTO player_fts (player_fts) VALUES ('delete-all')")
+            for table, _ in reversed(BULK_FILES):
+                connection.execute(f"DELETE FROM {table.name}")
+
+            counts = {}
+            for table, file_name in BULK_FILES:
+                path = os.path.join(bulk_dir, f"{file_name}.{file_format}")
+                counts[table.name] = load_table(
+                    connection, table, read_rows(path, batch_size))
+
+            _log_deleted_rows(connection)
+            for _, sql in indexes:
+                connection.execute(sql)
+            connection.execute(
+                "INSERT INTO player_week_points " + PLAYER_WEEK_POINTS_SELECT
+                + " GROUP BY performance.player_id, performance.week_number")
+            connection.execute(
+                "INSERT INTO player_cumulative_points "
+                + PLAYER_CUMULATIVE_POINTS_SELECT)
+            connection.execute(
+                "INSERT INTO player_fts (player_fts) VALUES ('rebuild')")
+            for _, sql in triggers:
+                connection.execute(sql)
+            for table, _ in BULK_FILES:
+                connection.execute(bump_table_version(table.name))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return counts
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load an SWC database")
+    parser.add_argument("--database-file", default=DATABASE_FILE)
+    parser.add_argument("--bulk-dir", default=BULK_DIR)
+    parser.add_argument("--format", dest="file_format", choices=READERS,
+                        default="csv")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    counts = bulk_load(args.database_file, args.bulk_dir, args.file_format,
+                       args.batch_size)
+    elapsed = time.perf_counter() - start
+    for table, count in counts.items():
+        print(f"{table:>12}: {count:>10,} rows")
+    total = sum(counts.values())
+    print(f"Loaded {total:,} rows in {elapsed:.2f} s "
+          f"({total / elapsed:,.0f} rows/sec) into {args.database_file}")
@@ -0,0 +1,170 @@
+"""Cache in front of the crud lookup functions
+
+Leagues and teams change a few times a day but are read thousands of
+times a minute, so main.py reads them through cached versions of the crud
+functions. Each cached function stores results under a key built from its
+normalized parameters. Entries expire after a TTL and the least recently
+used entries are evicted once the cache is full.
+
+There is no invalidation. Handlers pass the validator of the data as the
+version, which is part of the key, so a change to the data makes the old
+entries unreachable at once and they are left to expire or be evicted.
+
+The default backend is in process. Set SWC_CACHE_BACKEND=redis and
+SWC_CACHE_REDIS_URL to share one cache between workers, or
+SWC_CACHE_BACKEND=none to turn caching off.
+"""
+import inspect
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import crud
+
+
+class MemoryBackend:
+    """Size-bounded LRU cache with a TTL, local to one process"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Returns a tuple of whether the key was found and its value"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key: str, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisBackend:
+    """Cache shared by every worker through Redis.
+
+    Values are pickled and expire after the TTL. Redis evicts by its own 
+    maxmemory policy. Needs the redis package.
+    """
+
+    def __init__(self, url: str, prefix: str = "swc:cache"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get(self, key: str):
+        value = self.client.get(self._key(key))
+        if value is None:
+            return False, None
+        return True, pickle.loads(value)
+
+    def set(self, key: str, value, ttl: float):
+        self.client.set(self._key(key), pickle.dumps(value),
+                        px=max(1, int(ttl * 1000)))
+
+
+class CrudCache:
+    """Wraps crud functions so repeated calls are served from a backend"""
+
+    def __init__(self, backend=None, ttl: float = 60):
+        self.backend = backend
+        self.ttl = ttl
+        self.namespaces = set()
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+
+    def cached(self, crud_function, namespace: str):
+        """Returns a version of a crud function that uses the cache.
+
+        Results must be usable after their session closes, so only wrap
+        functions that load everything they return. Callers pass a
+        version, such as the validator of the data, to make entries for
+        older data unreachable as soon as the data changes.
+        """
+        signature = inspect.signature(crud_function)
+        self.namespaces.add(namespace)
+
+        @wraps(crud_function)
+        def cached_function(db, *args, version=None, **kwargs):
+            if self.backend is None:
+                return crud_function(db, *args, **kwargs)
+            key = self.make_key(namespace, crud_function, signature,
+                                db, *args, **kwargs)
+            if version is not None:
+                key = f"{key}:{version!r}"
+            found, value = self.backend.get(key)
+            self._count(self.hits if found else self.misses, namespace)
+            if found:
+                return value
+            value = crud_function(db, *args, **kwargs)
+            self.backend.set(key, value, self.ttl)
+            return value
+
+        return cached_function
+
+    @staticmethod
+    def make_key(namespace: str, crud_function, signature, db,
+                 *args, **kwargs) -> str:
+        """Builds a key that is the same for every call with the same
+        parameter values, however they were passed"""
+        arguments = signature.bind(db, *args, **kwargs)
+        arguments.apply_defaults()
+        parameters = sorted((name, value) for name, value in
+                            arguments.arguments.items() if name != "db")
+        return f"{namespace}:{crud_function.__name__}:{parameters!r}"
+
+    def _count(self, counter: dict, namespace: str):
+        with self._lock:
+            counter[namespace] = counter.get(namespace, 0) + 1
+
+    def stats(self) -> dict:
+        """Returns the hit and miss counts of each namespace"""
+        with self._lock:
+            return {namespace: {"hits": self.hits.get(namespace, 0),
+                                "misses": self.misses.get(namespace, 0)}
+                    for namespace in sorted(self.namespaces)}
+
+
+def configure_cache() -> CrudCache:
+    """Builds the cache from the SWC_CACHE_* environment variables"""
+    backend_name = os.getenv("SWC_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.getenv("SWC_CACHE_TTL", "60"))
+    if backend_name == "none":
+        return CrudCache(None, ttl)
+    if backend_name == "memory":
+        max_entries = int(os.getenv("SWC_CACHE_MAX_ENTRIES", "1024"))
+        return CrudCache(MemoryBackend(max_entries), ttl)
+    if backend_name == "redis":
+        return CrudCache(RedisBackend(
+            os.getenv("SWC_CACHE_REDIS_URL", "redis://localhost:6379/0")), ttl)
+    raise ValueError(f"Unknown SWC_CACHE_BACKEND {backend_name!r}")
+
+
+crud_cache = configure_cache()
+
+get_league = crud_cache.cached(crud.get_league, namespace="leagues")
+get_leagues = crud_cache.cached(crud.get_leagues, namespace="leagues")
+get_teams = crud_cache.cached(crud.get_teams, namespace="teams")
+get_leaderboard = crud_cache.cached(crud.get_leaderboard,
+                                    namespace="leaderboard")
+get_league_standings = crud_cache.cached(crud.get_league_standings,
+                                         namespace="standings")
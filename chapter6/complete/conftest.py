@@ -0,0 +1,29 @@
+"""Fixtures shared by test_crud.py and test_main.py"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from database import engine
+
+
+@contextmanager
+def _capture_statements():
+    """Records the SQL statements and parameters run against the database"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def capture_statements():
+    """Returns a context manager that yields a list of the (statement,
+    parameters) pairs run against the database inside it"""
+    return _capture_statements
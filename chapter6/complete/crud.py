@@ -1,18 +1,136 @@
 """SQLAlchemy Query Functions"""
-from sqlalchemy.orm import Session
+import json
+import re
+import threading
+from itertools import islice
+
+from sqlalchemy import Integer, String, and_, cast, column, func, select, table
+from sqlalchemy.orm import Session, aliased
 from sqlalchemy.orm import joinedload
-from datetime import date
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import date, datetime, timezone
 
 import models
+from pagination import paginate
 
 def get_player(db: Session, player_id: int):
-    return db.query(models.Player).filter(
+    return db.query(models.Player).options(
+        selectinload(models.Player.performances)).filter(
         models.Player.player_id == player_id).first()
 
+def get_players_by_ids(db: Session, player_ids: list[int]):
+    """Returns a dict of the players with these IDs, with their 
+    performances, using one IN query for each.
+
+    IDs that don't match a player are left out of the dict.
+    """
+    players = db.query(models.Player).filter(
+        models.Player.player_id.in_(player_ids)).all()
+    load_performances(db, players)
+    return {player.player_id: player for player in players}
+
+# the FTS5 index of player names added by migrations.py
+player_fts = table("player_fts", column("rowid"), column("player_fts"),
+                   column("rank"))
+
+def search_query(text: str) -> str:
+    """Turns search text into an FTS5 query that matches players whose 
+    names have a word starting with each word of the text"""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+def search_players(db: Session, q: str, limit: int = 10, 
+                   fields: list[str] = None):
+    """Returns the players whose names best match search text, best 
+    first, as rows of fields if given"""
+    match = search_query(q)
+    if not match:
+        return []
+    query = db.query(models.Player).join(
+        player_fts, player_fts.c.rowid == models.Player.player_id).filter(
+        player_fts.c.player_fts.op("MATCH")(match)).order_by(
+        player_fts.c.rank, models.Player.player_id).limit(limit)
+    if fields:
+        query = _with_fields(query, models.Player, fields)
+    return query.all()
+
+def player_page_keys(min_last_changed_date: date = None):
+    """Sort key used to page through players"""
+    return _sort_key(models.Player.player_id, models.Player.last_changed_date,
+                     min_last_changed_date)
+
 def get_players(db: Session, skip: int = 0, limit: int = 100, 
                 min_last_changed_date: date = None, 
-                last_name : str = None, first_name : str = None, ):
-    query = db.query(models.Player)
+                last_name : str = None, first_name : str = None, 
+                cursor: str = None, include_performances: bool = True,
+                fields: list[str] = None):
+    """Returns a page of players.
+
+    With fields, returns rows of just those columns instead of Player 
+    objects. They are much cheaper to build and serialize, but can't 
+    include performances.
+    """
+    query = _players_page(db, skip, limit, min_last_changed_date,
+                          last_name, first_name, cursor)
+    if fields:
+        return _with_fields(query, models.Player, fields).all()
+    players = query.all()
+    if include_performances:
+        load_performances(db, players)
+    return players
+
+def stream_players(db: Session, skip: int = 0, limit: int = 100, 
+                   min_last_changed_date: date = None, 
+                   last_name : str = None, first_name : str = None, 
+                   cursor: str = None, include_performances: bool = True,
+                   fields: list[str] = None, batch_size: int = 1000):
+    """Yields the players of get_players in lists of batch_size, 
+    reading them from the database as they are consumed"""
+    query = _players_page(db, skip, limit, min_last_changed_date,
+                          last_name, first_name, cursor)
+    if fields:
+        yield from _batches(_with_fields(query, models.Player, fields), 
+                            batch_size)
+        return
+    for players in _batches(query, batch_size):
+        if include_performances:
+            load_performances(db, players)
+        yield players
+
+def _players_page(db: Session, skip: int, limit: int,
+                  min_last_changed_date: date, last_name: str,
+                  first_name: str, cursor: str):
+    query = _filter_players(db.query(models.Player), min_last_changed_date,
+                            last_name, first_name)
+    return paginate(query, player_page_keys(min_last_changed_date),
+                    skip=skip, limit=limit, cursor=cursor)
+
+def _sort_key(primary_key, last_changed_date, min_last_changed_date: date):
+    """Orders by change date first when filtering on it, so the date index 
+    serves both the filter and the order"""
+    if min_last_changed_date:
+        return [last_changed_date, primary_key]
+    return [primary_key]
+
+def _with_fields(query, model, fields: list[str]):
+    return query.with_entities(*[_field(model, field) for field in fields])
+
+def _field(model, field: str):
+    column = getattr(model, field)
+    if column is models.Performance.week_number:
+        # stored as an integer, but the API returns week numbers as strings
+        return cast(column, String).label(field)
+    return column
+
+def _batches(query, batch_size: int):
+    """Splits a query's rows into lists, fetching them batch_size at a time"""
+    rows = iter(query.yield_per(batch_size))
+    while batch := list(islice(rows, batch_size)):
+        yield batch
+
+def _filter_players(query, min_last_changed_date: date = None,
+                    last_name: str = None, first_name: str = None):
     if min_last_changed_date:
         query = query.filter(
             models.Player.last_changed_date >= min_last_changed_date)
@@ -20,37 +138,149 @@ def get_players(db: Session, skip: int = 0, limit: int = 100,
         query = query.filter(models.Player.first_name == first_name)
     if last_name:
         query = query.filter(models.Player.last_name == last_name)
-    return query.offset(skip).limit(limit).all()
+    return query
+
+def load_performances(db: Session, players: list):
+    """Loads the performances of a page of players with one IN query.
+
+    selectinload would split large pages into chunks of 500 players.
+    """
+    performances_by_player = {player.player_id: [] for player in players}
+    if performances_by_player:
+        query = db.query(models.Performance).filter(
+            models.Performance.player_id.in_(performances_by_player)
+            ).order_by(models.Performance.performance_id)
+        for performance in query:
+            performances_by_player[performance.player_id].append(performance)
+    for player in players:
+        set_committed_value(player, "performances", 
+                            performances_by_player[player.player_id])
+    return players
+
 
+def performance_page_keys(min_last_changed_date: date = None):
+    """Sort key used to page through performances"""
+    return _sort_key(models.Performance.performance_id, 
+                     models.Performance.last_changed_date,
+                     min_last_changed_date)
 
 def get_performances(db: Session, skip: int = 0, limit: int = 100, 
-                     min_last_changed_date: date = None):
-    query = db.query(models.Performance)
+                     min_last_changed_date: date = None, cursor: str = None,
+                     fields: list[str] = None, min_week: int = None,
+                     max_week: int = None):
+    """Returns a page of performances, as rows of fields if given"""
+    query = _performances_page(db, skip, limit, min_last_changed_date, cursor,
+                               min_week, max_week)
+    if fields:
+        query = _with_fields(query, models.Performance, fields)
+    return query.all()
+
+def stream_performances(db: Session, skip: int = 0, limit: int = 100, 
+                        min_last_changed_date: date = None, 
+                        cursor: str = None, fields: list[str] = None,
+                        min_week: int = None, max_week: int = None,
+                        batch_size: int = 1000):
+    """Yields the performances of get_performances in lists of 
+    batch_size, reading them from the database as they are consumed"""
+    query = _performances_page(db, skip, limit, min_last_changed_date, cursor,
+                               min_week, max_week)
+    if fields:
+        query = _with_fields(query, models.Performance, fields)
+    yield from _batches(query, batch_size)
+
+def _performances_page(db: Session, skip: int, limit: int,
+                       min_last_changed_date: date, cursor: str,
+                       min_week: int = None, max_week: int = None):
+    query = _filter_performances(db.query(models.Performance),
+                                 min_last_changed_date, min_week, max_week)
+    return paginate(query, performance_page_keys(min_last_changed_date),
+                    skip=skip, limit=limit, cursor=cursor)
+
+def _filter_performances(query, min_last_changed_date: date = None,
+                         min_week: int = None, max_week: int = None):
     if min_last_changed_date:
         query = query.filter(
             models.Performance.last_changed_date >= min_last_changed_date)
-    return query.offset(skip).limit(limit).all()
+    if min_week is not None:
+        query = query.filter(models.Performance.week_number >= min_week)
+    if max_week is not None:
+        query = query.filter(models.Performance.week_number <= max_week)
+    return query
 
 def get_league(db: Session, league_id: int = None):
-    return db.query(models.League).filter(
+    return db.query(models.League).options(
+        joinedload(models.League.teams)).filter(
         models.League.league_id == league_id).first()
 
 def get_leagues(db: Session, skip: int = 0, limit: int = 100,
-                 min_last_changed_date: date = None,league_name: str = None):
-    query = db.query(models.League
-                    ).options(joinedload(models.League.teams))
+                 min_last_changed_date: date = None,league_name: str = None,
+                 include_teams: bool = True, fields: list[str] = None):
+    """Returns a page of leagues, as rows of fields if given.
+    
+    Rows of fields can't include teams.
+    """
+    query = db.query(models.League)
+    if fields:
+        query = _with_fields(query, models.League, fields)
+    elif include_teams:
+        query = query.options(joinedload(models.League.teams))
+    query = _filter_leagues(query, min_last_changed_date, league_name)
+    return query.order_by(*_sort_key(models.League.league_id, 
+                                     models.League.last_changed_date,
+                                     min_last_changed_date)
+                          ).offset(skip).limit(limit).all()
+
+def _filter_leagues(query, min_last_changed_date: date = None,
+                    league_name: str = None):
     if min_last_changed_date:
         query = query.filter(
             models.League.last_changed_date >= min_last_changed_date)                              
     if league_name: 
         query = query.filter(models.League.league_name == league_name)     
-    return query.offset(skip).limit(limit).all()
+    return query
 
 
 def get_teams(db: Session, skip: int = 0, limit: int = 100, 
               min_last_changed_date: date = None, 
-              team_name: str = None, league_id: int = None):
+              team_name: str = None, league_id: int = None,
+              include_players: bool = True, fields: list[str] = None):
+    """Returns a page of teams, as rows of fields if given.
+    
+    Rows of fields can't include players.
+    """
+    query = _teams_page(db, skip, limit, min_last_changed_date, team_name,
+                        league_id, include_players and not fields)
+    if fields:
+        query = _with_fields(query, models.Team, fields)
+    return query.all()
+
+def stream_teams(db: Session, skip: int = 0, limit: int = 100, 
+                 min_last_changed_date: date = None, 
+                 team_name: str = None, league_id: int = None,
+                 include_players: bool = True, fields: list[str] = None,
+                 batch_size: int = 1000):
+    """Yields the teams of get_teams in lists of batch_size, reading 
+    them from the database as they are consumed"""
+    query = _teams_page(db, skip, limit, min_last_changed_date, team_name,
+                        league_id, include_players and not fields)
+    if fields:
+        query = _with_fields(query, models.Team, fields)
+    yield from _batches(query, batch_size)
+
+def _teams_page(db: Session, skip: int, limit: int,
+                min_last_changed_date: date, team_name: str, league_id: int,
+                include_players: bool):
     query = db.query(models.Team)
+    if include_players:
+        query = query.options(selectinload(models.Team.players))
+    query = _filter_teams(query, min_last_changed_date, team_name, league_id)
+    return query.order_by(*_sort_key(models.Team.team_id, 
+                                     models.Team.last_changed_date,
+                                     min_last_changed_date)
+                          ).offset(skip).limit(limit)
+
+def _filter_teams(query, min_last_changed_date: date = None,
+                  team_name: str = None, league_id: int = None):
     if min_last_changed_date:
         query = query.filter(
             models.Team.last_changed_date >= min_last_changed_date)
@@ -58,7 +288,7 @@ def get_teams(db: Session, skip: int = 0, limit: int = 100,
         query = query.filter(models.Team.team_name == team_name)
     if league_id: 
         query = query.filter(models.Team.league_id == league_id)
-    return query.offset(skip).limit(limit).all()    
+    return query
 
 #analytics queries
 def get_player_count(db: Session):
@@ -71,4 +301,249 @@ def get_team_count(db: Session):
 
 def get_league_count(db: Session):
     query = db.query(models.League)
-    return query.count()
\ No newline at end of file
+    return query.count()
+
+# tables counted by get_counts
+COUNTED_TABLES = [models.League, models.Team, models.Player, 
+                  models.Performance]
+
+def get_counts(db: Session):
+    """Counts leagues, teams, players, and performances in one statement"""
+    return db.query(
+        _count_of(models.League).label("league_count"),
+        _count_of(models.Team).label("team_count"),
+        _count_of(models.Player).label("player_count"),
+        _count_of(models.Performance).label("performance_count"),
+    ).one()
+
+def _count_of(model, *criteria):
+    return select(func.count()).select_from(model).where(
+        *criteria).scalar_subquery()
+
+_counts_cache = {"version": None, "counts": None}
+_counts_cache_lock = threading.Lock()
+
+def get_cached_counts(db: Session, validator: tuple = None):
+    """Returns get_counts, recounting only after a counted table has 
+    changed.
+
+    The cache is checked against get_counts_validator, whose change 
+    counters move on every insert, update and delete. Pass its result if 
+    you already have it.
+    """
+    if validator is None:
+        validator = get_counts_validator(db)
+    with _counts_cache_lock:
+        if _counts_cache["version"] == validator:
+            return _counts_cache["counts"]
+    counts = get_counts(db)
+    with _counts_cache_lock:
+        _counts_cache["version"] = validator
+        _counts_cache["counts"] = counts
+    return counts
+
+def get_leaderboard(db: Session, min_week: int = None, max_week: int = None,
+                    position: str = None, limit: int = 50):
+    """Returns the players with the most fantasy points in a week range.
+
+    Takes each player's points in the range as their cumulative points at 
+    the last week of it less those at the week before it, so it reads two 
+    weeks of the player_cumulative_points index however long the range 
+    is. Then looks up the names of just the top players.
+    """
+    points = models.PlayerCumulativePoints
+    fantasy_points, week_count = points.fantasy_points, points.week_count
+    query = db.query(points.player_id).filter(
+        points.week_number == _last_week(max_week))
+    if min_week is not None:
+        before = aliased(models.PlayerCumulativePoints)
+        query = query.outerjoin(before, and_(
+            before.week_number == _last_week(min_week - 1),
+            before.position == points.position,
+            before.player_id == points.player_id))
+        fantasy_points = fantasy_points - func.coalesce(
+            before.fantasy_points, 0)
+        week_count = week_count - func.coalesce(before.week_count, 0)
+    if position:
+        query = query.filter(points.position == position)
+    top = query.add_columns(fantasy_points.label("fantasy_points"), 
+                            week_count.label("week_count")).filter(
+        week_count > 0).order_by(fantasy_points.desc(), 
+                                 points.player_id).limit(limit).subquery()
+    return db.query(top.c.player_id, models.Player.first_name,
+                    models.Player.last_name, models.Player.position,
+                    top.c.fantasy_points, top.c.week_count).join(
+        models.Player, models.Player.player_id == top.c.player_id).order_by(
+        top.c.fantasy_points.desc(), top.c.player_id).all()
+
+def _last_week(max_week: int = None):
+    """Returns a subquery of the last week in player_cumulative_points up to
+    max_week"""
+    weeks = aliased(models.PlayerCumulativePoints)
+    query = select(func.max(weeks.week_number))
+    if max_week is not None:
+        query = query.where(weeks.week_number <= max_week)
+    return query.scalar_subquery()
+
+def get_league_standings(db: Session, league_id: int):
+    """Returns the teams of a league ranked by fantasy points, each with 
+    its points for every week.
+
+    Points per team and week are summed in one statement from the 
+    team_player rows and the precomputed player_week_points table. Teams 
+    without any points are ranked last with empty weeks.
+    """
+    points = models.PlayerWeekPoints
+    rows = db.query(
+        models.Team.team_id, models.Team.team_name, points.week_number,
+        func.sum(points.fantasy_points).label("fantasy_points")).outerjoin(
+        models.TeamPlayer, models.TeamPlayer.team_id == models.Team.team_id
+        ).outerjoin(points, points.player_id == models.TeamPlayer.player_id
+        ).filter(models.Team.league_id == league_id).group_by(
+        models.Team.team_id, points.week_number).order_by(
+        models.Team.team_id, points.week_number).all()
+
+    standings = {}
+    for row in rows:
+        standing = standings.setdefault(row.team_id, {
+            "team_id": row.team_id, "team_name": row.team_name,
+            "fantasy_points": 0.0, "weeks": []})
+        if row.week_number is not None:
+            standing["fantasy_points"] += row.fantasy_points
+            standing["weeks"].append({"week_number": row.week_number,
+                                      "fantasy_points": row.fantasy_points})
+    ranked = sorted(standings.values(), 
+                    key=lambda standing: -standing["fantasy_points"])
+    for rank, standing in enumerate(ranked, start=1):
+        standing["rank"] = rank
+    return ranked
+
+#changes for delta sync, parents before the rows that refer to them
+CHANGE_TABLES = [models.League, models.Team, models.Player,
+                 models.TeamPlayer, models.Performance]
+
+def get_changes_watermark(db: Session):
+    """Returns the latest change or delete date across every table in 
+    CHANGE_TABLES"""
+    deleted = models.DeletedRow
+    latest = db.query(
+        *[select(func.max(model.last_changed_date)).scalar_subquery()
+          for model in CHANGE_TABLES],
+        *[select(func.max(deleted.deleted_date)).where(
+            deleted.table_name == model.__tablename__).scalar_subquery()
+          for model in CHANGE_TABLES]
+    ).one()
+    return max((changed for changed in latest if changed), default=None)
+
+def stream_changes(db: Session, since: date = None, batch_size: int = 1000):
+    """Yields the table name and a list of up to batch_size rows for every
+    row changed on or after since, one table at a time.
+
+    Each table's rows are read through its last_changed_date index, so
+    the work done is proportional to the number of changes.
+    """
+    for model in CHANGE_TABLES:
+        query = _with_fields(db.query(model), model,
+                             [column.key for column in model.__table__.columns])
+        if since:
+            query = query.filter(model.last_changed_date >= since)
+        query = query.order_by(model.last_changed_date)
+        for rows in _batches(query, batch_size):
+            yield model.__tablename__, rows
+
+def stream_deletions(db: Session, since: date = None, batch_size: int = 1000):
+    """Yields the table name and a list of up to batch_size primary keys 
+    for every row deleted on or after since, children before parents.
+
+    Each key is a dict of the primary key columns. Rows that were inserted
+    again since are not included.
+    """
+    deleted = models.DeletedRow
+    for model in reversed(CHANGE_TABLES):
+        query = db.query(deleted.row_key).filter(
+            deleted.table_name == model.__tablename__)
+        if since:
+            query = query.filter(deleted.deleted_date >= since)
+        query = query.order_by(deleted.deleted_date)
+        for rows in _batches(query, batch_size):
+            yield model.__tablename__, [json.loads(row.row_key) 
+                                        for row in rows]
+
+#validators for conditional requests
+def _table_version(model):
+    return select(models.TableVersion.version).where(
+        models.TableVersion.table_name == model.__tablename__
+    ).scalar_subquery()
+
+def _table_validator(db: Session, tables: list, *counts):
+    """Returns the change counters of the tables behind a response and 
+    the time of their latest change, in one statement.
+
+    Triggers raise a table's counter on every insert, update and delete, 
+    so this is a few primary key lookups however many rows the response 
+    covers. Counts of single rows by primary key go first in the 
+    fingerprint, so handlers can tell a missing row from an unchanged one.
+
+    The time of the latest change is only precise to the second, so it is 
+    None while that second lasts: another change in the same second would 
+    not move it, and a client could keep a stale copy.
+    """
+    table_names = [model.__tablename__ for model in tables]
+    row = db.query(
+        *counts, *[_table_version(model) for model in tables],
+        select(func.max(models.TableVersion.changed_at)).where(
+            models.TableVersion.table_name.in_(table_names)).scalar_subquery(),
+        cast(func.strftime('%s', 'now'), Integer)
+    ).one()
+    changed_at, now = row[-2:]
+    if changed_at >= now:
+        return tuple(row[:-2]), None
+    return tuple(row[:-2]), datetime.fromtimestamp(changed_at, timezone.utc)
+
+def get_counts_validator(db: Session):
+    return _table_validator(db, COUNTED_TABLES)
+
+def get_player_validator(db: Session, player_id: int):
+    return _table_validator(
+        db, [models.Player, models.Performance],
+        _count_of(models.Player, models.Player.player_id == player_id))
+
+def get_players_by_ids_validator(db: Session):
+    return _table_validator(db, [models.Player, models.Performance])
+
+def get_players_validator(db: Session, include_performances: bool = True):
+    tables = [models.Player]
+    if include_performances:
+        tables.append(models.Performance)
+    return _table_validator(db, tables)
+
+def get_performances_validator(db: Session):
+    return _table_validator(db, [models.Performance])
+
+def get_leaderboard_validator(db: Session):
+    """Validates every leaderboard at once, since the points of every week 
+    come from performance and the names and positions from player."""
+    return _table_validator(db, [models.Player, models.Performance])
+
+def get_league_validator(db: Session, league_id: int):
+    return _table_validator(
+        db, [models.League, models.Team],
+        _count_of(models.League, models.League.league_id == league_id))
+
+def get_league_standings_validator(db: Session, league_id: int):
+    return _table_validator(
+        db, [models.League, models.Team, models.TeamPlayer, 
+             models.Performance],
+        _count_of(models.League, models.League.league_id == league_id))
+
+def get_leagues_validator(db: Session, include_teams: bool = True):
+    tables = [models.League]
+    if include_teams:
+        tables.append(models.Team)
+    return _table_validator(db, tables)
+
+def get_teams_validator(db: Session, include_players: bool = True):
+    tables = [models.Team]
+    if include_players:
+        tables += [models.Player, models.TeamPlayer]
+    return _table_validator(db, tables)
@@ -1,13 +1,75 @@
 """Database configuration"""
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./fantasy_data.db"
+# Set SWC_DATABASE_FILE to serve a different SQLite file
+DATABASE_FILE = os.getenv("SWC_DATABASE_FILE", "./fantasy_data.db")
+
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_FILE}"
+SQLALCHEMY_ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_FILE}"
+
+# Set SWC_ASYNC_DB=true to serve requests with the async engine
+USE_ASYNC_DB = os.getenv("SWC_ASYNC_DB", "false").lower() in ("1", "true", "yes")
+
+# Set SWC_DB_PROFILE=read to tune SQLite for many read-only workers
+DB_PROFILE = os.getenv("SWC_DB_PROFILE", "default").lower()
+
+# PRAGMAs run on every new connection, in order, for each profile.
+# The read profile uses WAL so readers never wait on a writer, maps the
+# file into memory, keeps a larger page cache and temp tables in memory,
+# and makes the connections read-only.
+DB_PROFILES = {
+    "default": [],
+    "read": [
+        ("journal_mode", "WAL"),
+        ("mmap_size", 268435456),
+        ("cache_size", -65536),
+        ("temp_store", "MEMORY"),
+        ("query_only", "ON"),
+    ],
+}
+
+if DB_PROFILE not in DB_PROFILES:
+    raise ValueError(f"Unknown SWC_DB_PROFILE {DB_PROFILE!r}")
+
+# Each handler holds one session, so when every connection is in use more
+# requests wait for one, for up to pool_timeout seconds. The bound keeps a
+# burst from opening a SQLite connection, and on the async path a thread,
+# per request in flight.
+POOL_OPTIONS = {"pool_size": 20, "max_overflow": 10, "pool_timeout": 30}
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+
+def apply_profile(engine, profile: str = DB_PROFILE):
+    """Runs the PRAGMAs of a profile on each new connection of an engine"""
+    pragmas = DB_PROFILES[profile]
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas:
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
+    return engine
+
+
+engine = apply_profile(
+    create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        **POOL_OPTIONS,
+    )
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL, **POOL_OPTIONS)
+apply_profile(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(
+    autocommit=False, autoflush=False, bind=async_engine
+)
+
+Base = declarative_base()
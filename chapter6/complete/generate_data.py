@@ -0,0 +1,214 @@
+"""Synthetic SWC data generator for benchmarks
+
+Writes league, team, player, team_player and performance files in the
+layout of the bulk directory, scaled up from the bundled data by a
+multiplier. Names, positions, fantasy points and change dates are drawn
+from the bundled files, so the data looks like the real thing. Rosters
+follow the bundled shape too: seven players a team and no player twice
+in one league. The same seed and multiplier always give the same files.
+
+Parquet output needs pyarrow. Use --load to bulk load the files into a
+SQLite database as well.
+
+Typical usage example:
+
+    python generate_data.py --multiplier 100 --output-dir /tmp/swc_100x \
+        --load /tmp/swc_100x.db
+"""
+import argparse
+import csv
+import os
+import random
+import time
+from collections import defaultdict
+from itertools import islice
+
+import bulk_load
+
+PLAYERS_PER_TEAM = 7
+
+# teams in each group of five leagues, as in the bundled data
+TEAMS_PER_LEAGUE = [12, 8, 0, 0, 0]
+
+
+class Sample:
+    """Values drawn from the bundled bulk files"""
+
+    def __init__(self, bulk_dir: str = bulk_load.BULK_DIR):
+        leagues = self._read(bulk_dir, "league_data")
+        teams = self._read(bulk_dir, "team_data")
+        players = self._read(bulk_dir, "player_data")
+        performances = self._read(bulk_dir, "performance_data")
+
+        self.league_names = [league["league_name"] for league in leagues]
+        self.scoring_types = [league["scoring_type"] for league in leagues]
+        self.team_names = [team["team_name"] for team in teams]
+        self.first_names = [player["first_name"] for player in players]
+        self.last_names = [player["last_name"] for player in players]
+        self.positions = [player["position"] for player in players]
+        self.weeks = sorted({int(p["week_number"]) for p in performances})
+
+        position_of = {p["player_id"]: p["position"] for p in players}
+        self.points = defaultdict(list)
+        self.changed_dates = defaultdict(list)
+        for performance in performances:
+            self.points[position_of[performance["player_id"]]].append(
+                float(performance["fantasy_points"]))
+            self.changed_dates[int(performance["week_number"])].append(
+                performance["last_changed_date"])
+        self.league_date = leagues[0]["last_changed_date"]
+        self.team_date = teams[0]["last_changed_date"]
+        self.player_date = players[0]["last_changed_date"]
+        self.team_player_date = self._read(
+            bulk_dir, "team_player_data")[0]["last_changed_date"]
+
+    @staticmethod
+    def _read(bulk_dir: str, file_name: str) -> list[dict]:
+        path = os.path.join(bulk_dir, f"{file_name}.csv")
+        with open(path, newline="", encoding="utf-8") as csv_file:
+            return list(csv.DictReader(csv_file))
+
+
+def generate_tables(sample: Sample, multiplier: int, seed: int):
+    """Yields the file name, column names and a row iterator of each
+    table, parents first. Rows are generated as they are consumed."""
+    rng = random.Random(seed)
+    league_count = 5 * multiplier
+    player_count = 1018 * multiplier
+    positions = [rng.choice(sample.positions) for _ in range(player_count)]
+
+    def leagues():
+        for number in range(league_count):
+            yield (5001 + number, rng.choice(sample.league_names),
+                   rng.choice(sample.scoring_types), sample.league_date)
+
+    def league_team_counts():
+        for number in range(league_count):
+            yield 5001 + number, TEAMS_PER_LEAGUE[number % 5]
+
+    def teams():
+        team_id = 1001
+        for league_id, team_count in league_team_counts():
+            names = rng.sample(sample.team_names, team_count)
+            for name in names:
+                yield team_id, name, league_id, sample.team_date
+                team_id += 1
+
+    def team_players():
+        team_id = 1001
+        for _, team_count in league_team_counts():
+            roster = rng.sample(range(player_count),
+                                team_count * PLAYERS_PER_TEAM)
+            for team in range(team_count):
+                for player in roster[team * PLAYERS_PER_TEAM:
+                                     (team + 1) * PLAYERS_PER_TEAM]:
+                    yield team_id, 1001 + player, sample.team_player_date
+                team_id += 1
+
+    def players():
+        for number in range(player_count):
+            yield (1001 + number, f"90-{number:07d}",
+                   rng.choice(sample.first_names),
+                   rng.choice(sample.last_names), positions[number],
+                   sample.player_date)
+
+    def performances():
+        performance_id = 2501
+        for week in sample.weeks:
+            dates = sample.changed_dates[week]
+            for number in range(player_count):
+                yield (performance_id, week,
+                       rng.choice(sample.points[positions[number]]),
+                       1001 + number, rng.choice(dates))
+                performance_id += 1
+
+    yield "league_data", ["league_id", "league_name", "scoring_type",
+                          "last_changed_date"], leagues()
+    yield "team_data", ["team_id", "team_name", "league_id",
+                        "last_changed_date"], teams()
+    yield "player_data", ["player_id", "gsis_id", "first_name", "last_name",
+                          "position", "last_changed_date"], players()
+    yield "team_player_data", ["team_id", "player_id",
+                               "last_changed_date"], team_players()
+    yield "performance_data", ["performance_id", "week_number",
+                               "fantasy_points", "player_id",
+                               "last_changed_date"], performances()
+
+
+def write_csv(path: str, columns: list[str], rows, batch_size: int) -> int:
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(columns)
+        while batch := list(islice(rows, batch_size)):
+            writer.writerows(batch)
+            count += len(batch)
+    return count
+
+
+def _parquet_types() -> dict:
+    import pyarrow as pa
+
+    integer_columns = ["league_id", "team_id", "player_id", "performance_id",
+                       "week_number"]
+    return {**{column: pa.int64 for column in integer_columns},
+            "fantasy_points": pa.float64}
+
+
+def write_parquet(path: str, columns: list[str], rows,
+                  batch_size: int) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = _parquet_types()
+    schema = pa.schema([(column, types.get(column, pa.string)())
+                        for column in columns])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        while batch := list(islice(rows, batch_size)):
+            writer.write_batch(pa.record_batch(
+                [list(values) for values in zip(*batch)], schema=schema))
+            count += len(batch)
+    return count
+
+
+WRITERS = {"csv": write_csv, "parquet": write_parquet}
+
+
+def generate(output_dir: str, multiplier: int = 10, seed: int = 1,
+             file_format: str = "csv", batch_size: int = 50000,
+             bulk_dir: str = bulk_load.BULK_DIR) -> dict:
+    """Writes the scaled-up files and returns the rows in each"""
+    os.makedirs(output_dir, exist_ok=True)
+    sample = Sample(bulk_dir)
+    counts = {}
+    for file_name, columns, rows in generate_tables(sample, multiplier, seed):
+        path = os.path.join(output_dir, f"{file_name}.{file_format}")
+        counts[file_name] = WRITERS[file_format](
+            path, columns, rows, batch_size)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate SWC bulk data")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--multiplier", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--format", dest="file_format", choices=WRITERS,
+                        default="csv")
+    parser.add_argument("--load", metavar="DATABASE_FILE",
+                        help="Bulk load the files into this database too")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate(args.output_dir, args.multiplier, args.seed,
+                      args.file_format)
+    for file_name, count in counts.items():
+        print(f"{file_name:>16}: {count:>12,} rows")
+    print(f"Generated {sum(counts.values()):,} rows in "
+          f"{time.perf_counter() - start:.1f} s into {args.output_dir}")
+    if args.load:
+        start = time.perf_counter()
+        bulk_load.bulk_load(args.load, args.output_dir, args.file_format)
+        print(f"Loaded into {args.load} in "
+              f"{time.perf_counter() - start:.1f} s")
@@ -1,19 +1,31 @@
 """FastAPI program - Chapter 5"""
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from datetime import date
+import asyncio
+from datetime import date, datetime, time, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+import hashlib
+from typing import Literal
+from pydantic import TypeAdapter
+from pydantic_core import to_json
 
 
-import crud, schemas
-from database import SessionLocal
+import cache, crud, schemas
+import database
+from database import AsyncSessionLocal, SessionLocal
+from pagination import decode_cursor, next_cursor
 
 api_description = """
 This API provides read-only access to info from the Sports World Central (SWC) Fantasy Football API. 
 The endpoints are grouped into the following categories:
 
 ## Analytics
-Get information about health of the API and counts of leagues, teams, and players.
+Get information about health of the API, counts of leagues, teams, players, and performances, and every record changed since a date.
 
 ## Player
 You can get a list of an NFL players, or search for an individual player by player_id.
@@ -33,13 +45,184 @@ app = FastAPI(
 )
 
 
+# Sessions of the sync path open at once. A request waits for a slot here,
+# on the event loop, instead of in a threadpool thread blocked on the pool:
+# with every thread waiting for a connection, the requests holding them
+# could never get a thread to finish. The pool's overflow is left for the
+# sessions that streams open.
+session_slots = asyncio.Semaphore(database.POOL_OPTIONS["pool_size"])
+
+
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+async def get_db():
+    if database.USE_ASYNC_DB:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        async with session_slots:
+            db = SessionLocal()
+            try:
+                yield db
+            finally:
+                db.close()
+
+
+async def run_crud(db: Session | AsyncSession, crud_function, **kwargs):
+    """Runs a crud function without blocking the event loop.
+
+    On the async path the function runs on the AsyncSession's connection
+    with run_sync, so the crud queries are shared by both paths. On the
+    sync path it runs in the threadpool like a sync handler would.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(crud_function, **kwargs)
+    return await run_in_threadpool(crud_function, db, **kwargs)
+
+
+def _set_next_cursor(response: Response, rows: list, key_columns: list, limit: int):
+    """Adds the cursor for the next page to the response headers"""
+    cursor = next_cursor(rows, key_columns, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+
+
+def _not_modified(request: Request, response: Response, validator: tuple):
+    """Sets the ETag and Last-Modified headers from a crud validator.
+
+    Returns a 304 response if the client already has the current version,
+    so the handler can skip loading and serializing the body. Otherwise
+    returns None. The validator's last change is a datetime, a date, or
+    None to leave out Last-Modified.
+    """
+    fingerprint, last_changed = validator
+    request_key = repr(
+        (
+            request.url.path,
+            sorted(request.query_params.multi_items()),
+            request.headers.get("accept", ""),
+            fingerprint,
+            last_changed,
+        )
+    )
+    etag = f'W/"{hashlib.sha1(request_key.encode()).hexdigest()}"'
+    headers = {"ETag": etag, "Vary": "Accept"}
+    last_modified = None
+    if isinstance(last_changed, datetime):
+        last_modified = last_changed
+    elif last_changed:
+        last_modified = datetime.combine(last_changed, time.min, timezone.utc)
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        client_etags = [
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        ]
+        if "*" in client_etags or etag.removeprefix("W/") in client_etags:
+            return Response(status_code=304, headers=headers)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified <= since:
+            return Response(status_code=304, headers=headers)
+    return None
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+PERFORMANCE_FIELDS = list(schemas.Performance.model_fields)
+
+
+def _wants_ndjson(request: Request, output_format: str) -> bool:
+    """Checks the format parameter and Accept header for NDJSON"""
+    return output_format == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get(
+        "accept", ""
+    )
+
+
+@lru_cache
+def _list_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(list[schema])
+
+
+def _to_json(rows: list, schema=None) -> bytes:
+    """Serializes crud rows to JSON bytes in the shape of the response model.
+
+    Without a schema the rows must come from a crud function called with
+    fields. Their columns already match the schema, so they are written
+    as they are without validating each one. ORM objects with nested
+    lists are validated and serialized by a cached TypeAdapter, skipping
+    FastAPI's conversion to Python dicts.
+    """
+    if schema is None:
+        return to_json([row._asdict() for row in rows])
+    adapter = _list_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+def _to_json_lines(rows: list, schema=None) -> bytes:
+    """Serializes crud rows to newline-delimited JSON, like _to_json"""
+    if schema is None:
+        return b"".join(to_json(row._asdict()) + b"\n" for row in rows)
+    return b"".join(
+        schema.model_validate(row).model_dump_json().encode() + b"\n" for row in rows
+    )
+
+
+def _headers_of(response: Response) -> dict:
+    """Returns the headers set on a handler's response parameter, which
+    FastAPI leaves out when the handler returns its own Response"""
+    return {
+        name: value
+        for name, value in response.headers.items()
+        if name != "content-length"
+    }
+
+
+def _json_response(response: Response, rows: list, schema=None) -> Response:
+    return Response(
+        _to_json(rows, schema),
+        media_type="application/json",
+        headers=_headers_of(response),
+    )
+
+
+def _ndjson_response(
+    response: Response, stream_function, schema=None, **kwargs
+) -> StreamingResponse:
+    """Streams the rows of a crud stream function as newline-delimited JSON.
+
+    Each batch of rows is written as soon as it is read, so memory stays
+    flat no matter how many rows are returned. The stream opens its own
+    session because it is consumed after the handler has returned.
+    """
+
+    def lines():
+        db = SessionLocal()
+        try:
+            for rows in stream_function(db, **kwargs):
+                yield _to_json_lines(rows, schema)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        lines(), media_type=NDJSON_MEDIA_TYPE, headers=_headers_of(response)
+    )
+
+
+def _fields(include: str | None, base_schema) -> list[str] | None:
+    """Returns the columns to select for a lean list, or None when a
+    nested list is included and full objects are needed"""
+    return None if include else list(base_schema.model_fields)
 
 
 @app.get(
@@ -58,12 +241,14 @@ async def root():
     "/v0/players/",
     response_model=list[schemas.Player],
     summary="Get all the SWC players that meet all the parameters you sent with your request",
-    description="""Use this endpoint to get a list of SWC players. You can use the parameters to filter down the players in the list. Names are not unique. You use the skip and limit to perform pagination of the API. Don't use the Player ID values to perform counts. Those are not guaranteed to be in order.""",
+    description="""Use this endpoint to get a list of SWC players. You can use the parameters to filter down the players in the list. Names are not unique. You use the skip and limit to perform pagination of the API. For deep pagination, send the value of the X-Next-Cursor response header back as the cursor parameter to get the next page. Don't use the Player ID values to perform counts. Those are not guaranteed to be in order. Performances are only included if you ask for them with the include parameter.""",
     response_description="A list of NFL players that are in SWC fantasy football. They don't to be on a team.",
     operation_id="v0_get_players",
     tags=["players"],
 )
-def read_players(
+async def read_players(
+    request: Request,
+    response: Response,
     skip: int = Query(
         0, description="The number of items to skip at the beginning of API call."
     ),
@@ -78,17 +263,189 @@ def read_players(
         None, description="The first name of the players to return"
     ),
     last_name: str = Query(None, description="The last name of the players to return"),
+    cursor: str = Query(
+        None,
+        description="The X-Next-Cursor header value from the previous page. Use the same filters as the previous page. The skip parameter is ignored when this is used.",
+    ),
+    include: Literal["performances"] = Query(
+        None, description="Nested list to include with each player."
+    ),
+    output_format: Literal["json", "ndjson"] = Query(
+        "json",
+        alias="format",
+        description="Use ndjson to stream one JSON record per line. You can also send an Accept header of application/x-ndjson.",
+    ),
     db: Session = Depends(get_db),
 ):
-    players = crud.get_players(
+    not_modified = _not_modified(
+        request,
+        response,
+        await run_crud(
+            db,
+            crud.get_players_validator,
+            include_performances=include == "performances",
+        ),
+    )
+    if not_modified:
+        return not_modified
+    if _wants_ndjson(request, output_format):
+        try:
+            if cursor:
+                decode_cursor(cursor, crud.player_page_keys(minimum_last_changed_date))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return _ndjson_response(
+            response,
+            crud.stream_players,
+            schemas.Player if include else None,
+            skip=skip,
+            limit=limit,
+            min_last_changed_date=minimum_last_changed_date,
+            first_name=first_name,
+            last_name=last_name,
+            cursor=cursor,
+            include_performances=include == "performances",
+            fields=_fields(include, schemas.PlayerBase),
+        )
+    try:
+        players = await run_crud(
+            db,
+            crud.get_players,
+            skip=skip,
+            limit=limit,
+            min_last_changed_date=minimum_last_changed_date,
+            first_name=first_name,
+            last_name=last_name,
+            cursor=cursor,
+            include_performances=include == "performances",
+            fields=_fields(include, schemas.PlayerBase),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _set_next_cursor(
+        response, players, crud.player_page_keys(minimum_last_changed_date), limit
+    )
+    return _json_response(response, players, schemas.Player if include else None)
+
+
+@app.get(
+    "/v0/players/search",
+    response_model=list[schemas.PlayerBase],
+    summary="Search for SWC players by name",
+    description="""Use this endpoint for autocomplete and name search. Each word you send matches the start of a player's first or last name, so "jos al" finds Josh Allen. The best matches are returned first. Performances are not included.""",
+    response_description="The players whose names best match the search, best first.",
+    operation_id="v0_search_players",
+    tags=["players"],
+)
+async def search_players(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, description="The name, or the start of it."),
+    limit: int = Query(
+        10, ge=1, le=100, description="The number of players to return."
+    ),
+    db: Session = Depends(get_db),
+):
+    # runs on every keystroke, so it reads the player change counter
+    # instead of counting the players
+    not_modified = _not_modified(
+        request,
+        response,
+        await run_crud(db, crud.get_players_validator, include_performances=False),
+    )
+    if not_modified:
+        return not_modified
+    players = await run_crud(
         db,
-        skip=skip,
+        crud.search_players,
+        q=q,
         limit=limit,
-        min_last_changed_date=minimum_last_changed_date,
-        first_name=first_name,
-        last_name=last_name,
+        fields=list(schemas.PlayerBase.model_fields),
+    )
+    return _json_response(response, players)
+
+
+MAX_BATCH_IDS = 1000
+
+
+def _batch_ids(player_ids: list[int]) -> list[int]:
+    """Drops duplicate IDs, keeping their order, and checks the batch size"""
+    player_ids = list(dict.fromkeys(player_ids))
+    if not player_ids or len(player_ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Send between 1 and {MAX_BATCH_IDS} player IDs",
+        )
+    return player_ids
+
+
+async def _player_batch(db: Session, player_ids: list[int]) -> dict:
+    """Looks up a batch of players, reporting each ID as found or not"""
+    players = await run_crud(db, crud.get_players_by_ids, player_ids=player_ids)
+    return {
+        "players": [
+            {
+                "player_id": player_id,
+                "found": player_id in players,
+                "player": players.get(player_id),
+            }
+            for player_id in player_ids
+        ]
+    }
+
+
+@app.get(
+    "/v0/players/batch",
+    response_model=schemas.PlayerBatch,
+    summary="Get many players at once using their Player IDs",
+    description=f"""Use this endpoint instead of calling v0_get_players_by_player_id once for each player. Send up to {MAX_BATCH_IDS} Player IDs in the ids parameter, either repeated or separated by commas. The players are returned in the order you sent their IDs, with their performances. An ID that doesn't match a player is returned with found set to false instead of failing the whole request.""",
+    response_description="One item for each Player ID, with the player if it was found.",
+    operation_id="v0_get_players_batch",
+    tags=["players"],
+)
+async def read_players_batch(
+    request: Request,
+    response: Response,
+    ids: list[str] = Query(
+        ..., description="The Player IDs to return, repeated or comma-separated."
+    ),
+    db: Session = Depends(get_db),
+):
+    try:
+        player_ids = _batch_ids(
+            [
+                int(player_id)
+                for value in ids
+                for player_id in value.split(",")
+                if player_id
+            ]
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Player IDs must be integers")
+    not_modified = _not_modified(
+        request,
+        response,
+        await run_crud(db, crud.get_players_by_ids_validator),
     )
-    return players
+    if not_modified:
+        return not_modified
+    return await _player_batch(db, player_ids)
+
+
+@app.post(
+    "/v0/players/batch",
+    response_model=schemas.PlayerBatch,
+    summary="Get many players at once using Player IDs sent in the request body",
+    description=f"""Use this endpoint like v0_get_players_batch when the list of Player IDs is too long for a URL. Send up to {MAX_BATCH_IDS} IDs in the ids list of the JSON body.""",
+    response_description="One item for each Player ID, with the player if it was found.",
+    operation_id="v0_post_players_batch",
+    tags=["players"],
+)
+async def read_players_batch_post(
+    batch_request: schemas.PlayerBatchRequest, db: Session = Depends(get_db)
+):
+    player_ids = _batch_ids(batch_request.ids)
+    return await _player_batch(db, player_ids)
 
 
 @app.get(
@@ -100,8 +457,17 @@ def read_players(
     operation_id="v0_get_players_by_player_id",
     tags=["players"],
 )
-def read_player(player_id: int, db: Session = Depends(get_db)):
-    player = crud.get_player(db, player_id=player_id)
+async def read_player(
+    player_id: int, request: Request, response: Response, db: Session = Depends(get_db)
+):
+    validator = await run_crud(db, crud.get_player_validator, player_id=player_id)
+    (player_count, *_), _ = validator
+    if not player_count:
+        raise HTTPException(status_code=404, detail="Player not found")
+    not_modified = _not_modified(request, response, validator)
+    if not_modified:
+        return not_modified
+    player = await run_crud(db, crud.get_player, player_id=player_id)
     if player is None:
         raise HTTPException(status_code=404, detail="Player not found")
     return player
@@ -111,12 +477,14 @@ def read_player(player_id: int, db: Session = Depends(get_db)):
     "/v0/performances/",
     response_model=list[schemas.Performance],
     summary="Get all the weekly performances that meet all the parameters you sent with your request",
-    description="""Use this endpoint to get lists of weekly performances by players in the SWC. You us the skip and limit to perform pagination of the API. Don't use the Performance ID for counting or logic, because that is an internal ID and is not guaranteed to be sequential""",
+    description="""Use this endpoint to get lists of weekly performances by players in the SWC. You us the skip and limit to perform pagination of the API. For deep pagination, send the value of the X-Next-Cursor response header back as the cursor parameter to get the next page. Don't use the Performance ID for counting or logic, because that is an internal ID and is not guaranteed to be sequential. Use min_week and max_week to get a range of weeks. Set both to the same week, such as 202301, to get one week.""",
     response_description="A list of weekly scoring performances. It may be by multiple players.",
     operation_id="v0_get_performances",
     tags=["scoring"],
 )
-def read_performances(
+async def read_performances(
+    request: Request,
+    response: Response,
     skip: int = Query(
         0, description="The number of items to skip at the beginning of API call."
     ),
@@ -127,12 +495,71 @@ def read_performances(
         None,
         description="The minimum data of change that you want to return records. Exclude any records changed before this.",
     ),
+    cursor: str = Query(
+        None,
+        description="The X-Next-Cursor header value from the previous page. Use the same filters as the previous page. The skip parameter is ignored when this is used.",
+    ),
+    min_week: int = Query(
+        None, description="The first week to return, such as 202301."
+    ),
+    max_week: int = Query(None, description="The last week to return, such as 202301."),
+    output_format: Literal["json", "ndjson"] = Query(
+        "json",
+        alias="format",
+        description="Use ndjson to stream one JSON record per line. You can also send an Accept header of application/x-ndjson.",
+    ),
     db: Session = Depends(get_db),
 ):
-    performances = crud.get_performances(
-        db, skip=skip, limit=limit, min_last_changed_date=minimum_last_changed_date
+    not_modified = _not_modified(
+        request,
+        response,
+        await run_crud(
+            db,
+            crud.get_performances_validator,
+        ),
+    )
+    if not_modified:
+        return not_modified
+    if _wants_ndjson(request, output_format):
+        try:
+            if cursor:
+                decode_cursor(
+                    cursor, crud.performance_page_keys(minimum_last_changed_date)
+                )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return _ndjson_response(
+            response,
+            crud.stream_performances,
+            skip=skip,
+            limit=limit,
+            min_last_changed_date=minimum_last_changed_date,
+            cursor=cursor,
+            fields=PERFORMANCE_FIELDS,
+            min_week=min_week,
+            max_week=max_week,
+        )
+    try:
+        performances = await run_crud(
+            db,
+            crud.get_performances,
+            skip=skip,
+            limit=limit,
+            min_last_changed_date=minimum_last_changed_date,
+            cursor=cursor,
+            fields=PERFORMANCE_FIELDS,
+            min_week=min_week,
+            max_week=max_week,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _set_next_cursor(
+        response,
+        performances,
+        crud.performance_page_keys(minimum_last_changed_date),
+        limit,
     )
-    return performances
+    return _json_response(response, performances)
 
 
 @app.get(
@@ -144,23 +571,63 @@ def read_performances(
     operation_id="v0_get_league_by_league_id",
     tags=["membership"],
 )
-def read_league(league_id: int, db: Session = Depends(get_db)):
-    league = crud.get_league(db, league_id=league_id)
+async def read_league(
+    league_id: int, request: Request, response: Response, db: Session = Depends(get_db)
+):
+    validator = await run_crud(db, crud.get_league_validator, league_id=league_id)
+    (league_count, *_), _ = validator
+    if not league_count:
+        raise HTTPException(status_code=404, detail="League not found")
+    not_modified = _not_modified(request, response, validator)
+    if not_modified:
+        return not_modified
+    league = await run_crud(
+        db, cache.get_league, league_id=league_id, version=tuple(validator)
+    )
     if league is None:
         raise HTTPException(status_code=404, detail="League not found")
     return league
 
 
+@app.get(
+    "/v0/leagues/{league_id}/standings",
+    response_model=list[schemas.TeamStanding],
+    summary="Get the standings of the teams in one league",
+    description="""Use this endpoint to rank the teams in a league by the fantasy points their players scored, instead of adding up the performances of each team's players yourself. Each team includes its points for every week.""",
+    response_description="The teams of the league, highest total fantasy points first.",
+    operation_id="v0_get_league_standings",
+    tags=["membership"],
+)
+async def read_league_standings(
+    league_id: int, request: Request, response: Response, db: Session = Depends(get_db)
+):
+    validator = await run_crud(
+        db, crud.get_league_standings_validator, league_id=league_id
+    )
+    (league_count, *_), _ = validator
+    if not league_count:
+        raise HTTPException(status_code=404, detail="League not found")
+    not_modified = _not_modified(request, response, validator)
+    if not_modified:
+        return not_modified
+    standings = await run_crud(
+        db, cache.get_league_standings, league_id=league_id, version=tuple(validator)
+    )
+    return _json_response(response, standings, schemas.TeamStanding)
+
+
 @app.get(
     "/v0/leagues/",
     response_model=list[schemas.League],
     summary="Get all the SWC fantasy football leagues that match the parameters you send",
-    description="""Use this endpoint to get lists of SWC fantasy football leagues. You us the skip and limit to perform pagination of the API. League name is not guaranteed to be unique. Don't use the League ID for counting or logic, because that is an internal ID and is not guaranteed to be sequential""",
+    description="""Use this endpoint to get lists of SWC fantasy football leagues. You us the skip and limit to perform pagination of the API. League name is not guaranteed to be unique. Don't use the League ID for counting or logic, because that is an internal ID and is not guaranteed to be sequential. Teams are only included if you ask for them with the include parameter.""",
     response_description="A list of leagues on the SWC fantasy football website.",
     operation_id="v0_get_leagues",
     tags=["membership"],
 )
-def read_leagues(
+async def read_leagues(
+    request: Request,
+    response: Response,
     skip: int = Query(
         0, description="The number of items to skip at the beginning of API call."
     ),
@@ -174,28 +641,45 @@ def read_leagues(
     league_name: str = Query(
         None, description="Name of the leagues to return. Not unique in the SWC."
     ),
+    include: Literal["teams"] = Query(
+        None, description="Nested list to include with each league."
+    ),
     db: Session = Depends(get_db),
 ):
-    leagues = crud.get_leagues(
+    validator = await run_crud(
+        db,
+        crud.get_leagues_validator,
+        include_teams=include == "teams",
+    )
+    not_modified = _not_modified(request, response, validator)
+    if not_modified:
+        return not_modified
+    leagues = await run_crud(
         db,
+        cache.get_leagues,
+        version=tuple(validator),
         skip=skip,
         limit=limit,
         min_last_changed_date=minimum_last_changed_date,
         league_name=league_name,
+        include_teams=include == "teams",
+        fields=_fields(include, schemas.LeagueBase),
     )
-    return leagues
+    return _json_response(response, leagues, schemas.League if include else None)
 
 
 @app.get(
     "/v0/teams/",
     response_model=list[schemas.Team],
     summary="Get all the SWC fantasy football teams that match the parameters you send",
-    description="""Use this endpoint to get lists of SWC fantasy football teams. You us the skip and limit to perform pagination of the API. Team name is not guaranteed to be unique. If you get the Team ID from another query such as v0_get_players, you can match it with the Team ID from this query.  Don't use the Team ID for counting or logic, because that is an internal ID and is not guaranteed to be sequential""",
+    description="""Use this endpoint to get lists of SWC fantasy football teams. You us the skip and limit to perform pagination of the API. Team name is not guaranteed to be unique. If you get the Team ID from another query such as v0_get_players, you can match it with the Team ID from this query.  Don't use the Team ID for counting or logic, because that is an internal ID and is not guaranteed to be sequential. Players are only included if you ask for them with the include parameter.""",
     response_description="A list of teams on the SWC fantasy football website.",
     operation_id="v0_get_teams",
     tags=["membership"],
 )
-def read_teams(
+async def read_teams(
+    request: Request,
+    response: Response,
     skip: int = Query(
         0, description="The number of items to skip at the beginning of API call."
     ),
@@ -213,32 +697,148 @@ def read_teams(
     league_id: int = Query(
         None, description="League ID of the teams to return. Unique in SWC."
     ),
+    include: Literal["players"] = Query(
+        None, description="Nested list to include with each team."
+    ),
+    output_format: Literal["json", "ndjson"] = Query(
+        "json",
+        alias="format",
+        description="Use ndjson to stream one JSON record per line. You can also send an Accept header of application/x-ndjson.",
+    ),
     db: Session = Depends(get_db),
 ):
-    teams = crud.get_teams(
+    validator = await run_crud(
         db,
+        crud.get_teams_validator,
+        include_players=include == "players",
+    )
+    not_modified = _not_modified(request, response, validator)
+    if not_modified:
+        return not_modified
+    if _wants_ndjson(request, output_format):
+        return _ndjson_response(
+            response,
+            crud.stream_teams,
+            schemas.Team if include else None,
+            skip=skip,
+            limit=limit,
+            min_last_changed_date=minimum_last_changed_date,
+            team_name=team_name,
+            league_id=league_id,
+            include_players=include == "players",
+            fields=_fields(include, schemas.TeamBase),
+        )
+    teams = await run_crud(
+        db,
+        cache.get_teams,
+        version=tuple(validator),
         skip=skip,
         limit=limit,
         min_last_changed_date=minimum_last_changed_date,
         team_name=team_name,
         league_id=league_id,
+        include_players=include == "players",
+        fields=_fields(include, schemas.TeamBase),
     )
-    return teams
+    return _json_response(response, teams, schemas.Team if include else None)
+
+
+@app.get(
+    "/v0/leaderboard/",
+    response_model=list[schemas.LeaderboardEntry],
+    summary="Get the players who scored the most fantasy points in a range of weeks",
+    description="""Use this endpoint to rank players by their total fantasy points instead of adding up performances yourself. Week numbers are the year followed by the week, such as 202301. Leave out min_week and max_week to rank the whole season. The week_count is the number of weeks in the range that each player scored in.""",
+    response_description="Players ordered by total fantasy points, highest first.",
+    operation_id="v0_get_leaderboard",
+    tags=["scoring"],
+)
+async def read_leaderboard(
+    request: Request,
+    response: Response,
+    min_week: int = Query(
+        None, description="The first week to include, such as 202301."
+    ),
+    max_week: int = Query(
+        None, description="The last week to include, such as 202310."
+    ),
+    position: str = Query(
+        None, description="Only rank players at this position, such as QB."
+    ),
+    limit: int = Query(50, description="The number of players to return."),
+    db: Session = Depends(get_db),
+):
+    validator = await run_crud(db, crud.get_leaderboard_validator)
+    not_modified = _not_modified(request, response, validator)
+    if not_modified:
+        return not_modified
+    leaders = await run_crud(
+        db,
+        cache.get_leaderboard,
+        version=tuple(validator),
+        min_week=min_week,
+        max_week=max_week,
+        position=position,
+        limit=limit,
+    )
+    return _json_response(response, leaders)
 
 
 @app.get(
     "/v0/counts/",
     response_model=schemas.Counts,
-    summary="Get counts of the number of leagues, teams, and players in the SWC fantasy football",
-    description="""Use this endpoint to count the number of leagues, teams, and players in the SWC fantasy football. Use in combination with skip and limit in v0_get leagues, v0_get_teams, or v0_get_players. Use this endpoint to get counts instead of making calls to the other APIs.""",
+    summary="Get counts of the number of leagues, teams, players, and performances in the SWC fantasy football",
+    description="""Use this endpoint to count the number of leagues, teams, players, and performances in the SWC fantasy football. Use in combination with skip and limit in v0_get leagues, v0_get_teams, v0_get_players, or v0_get_performances. Use this endpoint to get counts instead of making calls to the other APIs.""",
     response_description="A list of teams on the SWC fantasy football website.",
     operation_id="v0_get_counts",
     tags=["analytics"],
 )
-def get_count(db: Session = Depends(get_db)):
-    counts = schemas.Counts(
-        league_count=crud.get_league_count(db),
-        team_count=crud.get_team_count(db),
-        player_count=crud.get_player_count(db),
-    )
-    return counts
+async def get_count(
+    request: Request, response: Response, db: Session = Depends(get_db)
+):
+    validator = await run_crud(db, crud.get_counts_validator)
+    not_modified = _not_modified(request, response, validator)
+    if not_modified:
+        return not_modified
+    counts = await run_crud(db, crud.get_cached_counts, validator=validator)
+    return schemas.Counts(**counts._mapping)
+
+
+@app.get(
+    "/v0/changes/",
+    summary="Get every SWC record that changed since a date, in one stream",
+    description="""Use this endpoint to keep a copy of the SWC data in sync. It streams one JSON record per line for every league, team, player, team_player, and performance row deleted or changed on or after the since date. Deletes come first, children before parents, and each has the table name and the deleted primary key, such as {"table": "team", "deleted": {"team_id": 1}}. Changed rows follow, parents first, and each has the table name and the row. The last line has a watermark. Send it as since on your next call to get only what changed after this one. Change dates are days, so records from the watermark date are sent again; apply them as upserts and deletes. Leave out since to get everything.""",
+    response_description="Newline-delimited JSON records, ending with a watermark.",
+    operation_id="v0_get_changes",
+    tags=["analytics"],
+)
+async def read_changes(
+    since: date = Query(
+        None,
+        description="The watermark from your last call. Only records deleted or changed on or after this date are returned.",
+    ),
+    db: Session = Depends(get_db),
+):
+    # read the watermark first, so a change made while streaming is either
+    # in this stream or on or after the watermark
+    watermark = await run_crud(db, crud.get_changes_watermark)
+    if since and (watermark is None or since > watermark):
+        watermark = since
+
+    def lines():
+        stream_db = SessionLocal()
+        try:
+            for table, keys in crud.stream_deletions(stream_db, since=since):
+                yield b"".join(
+                    to_json({"table": table, "deleted": key}) + b"\n" for key in keys
+                )
+            for table, rows in crud.stream_changes(stream_db, since=since):
+                yield b"".join(
+                    to_json({"table": table, "row": row._asdict()}) + b"\n"
+                    for row in rows
+                )
+        finally:
+            stream_db.close()
+        yield to_json({"watermark": watermark}) + b"\n"
+
+    headers = {"X-Watermark": watermark.isoformat()} if watermark else {}
+    return StreamingResponse(lines(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,394 @@
+"""Database migrations
+
+Each migration runs once, in order, inside its own transaction. The number
+of migrations applied is stored in the SQLite user_version, so running
+this again on a migrated database does nothing.
+
+Typical usage example:
+
+    python migrations.py fantasy_data.db
+"""
+import argparse
+import sqlite3
+
+from database import DATABASE_FILE
+
+# Sums the performances of each player and week for player_week_points
+PLAYER_WEEK_POINTS_SELECT = (
+    "SELECT performance.player_id, CAST(performance.week_number AS INTEGER), "
+    "COALESCE(player.position, ''), SUM(performance.fantasy_points), "
+    "COUNT(*), MAX(performance.last_changed_date) "
+    "FROM performance LEFT JOIN player "
+    "ON player.player_id = performance.player_id"
+)
+
+
+def refresh_player_week_points(row: str) -> str:
+    """Returns trigger statements that recompute the player_week_points row
+    of the OLD or NEW performance from the performance table"""
+    return (
+        "DELETE FROM player_week_points "
+        f"WHERE player_id = {row}.player_id "
+        f"AND week_number = CAST({row}.week_number AS INTEGER); "
+        f"INSERT INTO player_week_points {PLAYER_WEEK_POINTS_SELECT} "
+        f"WHERE performance.player_id = {row}.player_id "
+        f"AND performance.week_number = {row}.week_number "
+        "GROUP BY performance.player_id, performance.week_number; "
+    )
+
+
+# Triggers on performance that keep player_week_points up to date
+PERFORMANCE_TRIGGERS = [
+    "CREATE TRIGGER performance_insert_player_week_points "
+    "AFTER INSERT ON performance BEGIN "
+    + refresh_player_week_points("NEW") + " END",
+    "CREATE TRIGGER performance_delete_player_week_points "
+    "AFTER DELETE ON performance BEGIN "
+    + refresh_player_week_points("OLD") + " END",
+    "CREATE TRIGGER performance_update_player_week_points "
+    "AFTER UPDATE OF player_id, week_number, fantasy_points, "
+    "last_changed_date ON performance BEGIN "
+    + refresh_player_week_points("OLD")
+    + refresh_player_week_points("NEW") + " END",
+]
+
+
+# Totals of each player's points up to each week for player_cumulative_points.
+# Every player gets a row for every week, starting at zero before their first.
+PLAYER_CUMULATIVE_POINTS_SELECT = (
+    "SELECT players.player_id, weeks.week_number, players.position, "
+    "SUM(COALESCE(player_week_points.fantasy_points, 0)) OVER cumulative, "
+    "COUNT(player_week_points.player_id) OVER cumulative "
+    "FROM (SELECT DISTINCT week_number FROM player_week_points) AS weeks "
+    "CROSS JOIN (SELECT player_id, MAX(position) AS position "
+    "FROM player_week_points GROUP BY player_id) AS players "
+    "LEFT JOIN player_week_points "
+    "ON player_week_points.player_id = players.player_id "
+    "AND player_week_points.week_number = weeks.week_number "
+    "WINDOW cumulative AS "
+    "(PARTITION BY players.player_id ORDER BY weeks.week_number)"
+)
+
+
+# Triggers on player_week_points that keep player_cumulative_points up to
+# date. A new week starts from the totals of the week before it, and a new
+# player starts at zero in every week, so each player keeps a row for every
+# week. Then the points are added to or taken from the player's totals for
+# that week and the weeks after it.
+PLAYER_WEEK_POINTS_TRIGGERS = [
+    "CREATE TRIGGER player_week_points_insert_cumulative_points "
+    "AFTER INSERT ON player_week_points BEGIN "
+    "INSERT INTO player_cumulative_points "
+    "SELECT player_id, NEW.week_number, position, "
+    "CASE WHEN week_number < NEW.week_number THEN fantasy_points ELSE 0 END, "
+    "CASE WHEN week_number < NEW.week_number THEN week_count ELSE 0 END "
+    "FROM player_cumulative_points WHERE week_number = COALESCE("
+    "(SELECT MAX(week_number) FROM player_cumulative_points "
+    "WHERE week_number < NEW.week_number), "
+    "(SELECT MIN(week_number) FROM player_cumulative_points)) "
+    "AND NOT EXISTS (SELECT 1 FROM player_cumulative_points "
+    "WHERE week_number = NEW.week_number); "
+    "INSERT INTO player_cumulative_points "
+    "SELECT NEW.player_id, week_number, NEW.position, 0, 0 "
+    "FROM player_cumulative_points WHERE player_id = "
+    "(SELECT MIN(player_id) FROM player_cumulative_points) "
+    "AND NOT EXISTS (SELECT 1 FROM player_cumulative_points "
+    "WHERE player_id = NEW.player_id); "
+    "INSERT OR IGNORE INTO player_cumulative_points "
+    "VALUES (NEW.player_id, NEW.week_number, NEW.position, 0, 0); "
+    "UPDATE player_cumulative_points "
+    "SET fantasy_points = fantasy_points + NEW.fantasy_points, "
+    "week_count = week_count + 1 WHERE player_id = NEW.player_id "
+    "AND week_number >= NEW.week_number; END",
+    "CREATE TRIGGER player_week_points_delete_cumulative_points "
+    "AFTER DELETE ON player_week_points BEGIN "
+    "UPDATE player_cumulative_points "
+    "SET fantasy_points = fantasy_points - OLD.fantasy_points, "
+    "week_count = week_count - 1 WHERE player_id = OLD.player_id "
+    "AND week_number >= OLD.week_number; END",
+    "CREATE TRIGGER player_week_points_update_cumulative_points "
+    "AFTER UPDATE OF position ON player_week_points BEGIN "
+    "UPDATE player_cumulative_points SET position = NEW.position "
+    "WHERE player_id = NEW.player_id; END",
+]
+
+
+# Tables whose changes are counted in table_version
+VERSIONED_TABLES = ["league", "team", "player", "team_player", "performance"]
+
+
+def bump_table_version(table_name: str) -> str:
+    """Returns a statement that raises the change counter of a table and
+    records the time of the change"""
+    return (
+        "UPDATE table_version SET version = version + 1, "
+        "changed_at = CAST(strftime('%s', 'now') AS INTEGER) "
+        f"WHERE table_name = '{table_name}'"
+    )
+
+
+# Triggers that count every insert, update and delete in table_version
+TABLE_VERSION_TRIGGERS = [
+    f"CREATE TRIGGER {table_name}_{event.lower()}_table_version "
+    f"AFTER {event} ON {table_name} BEGIN "
+    + bump_table_version(table_name) + "; END"
+    for table_name in VERSIONED_TABLES
+    for event in ("INSERT", "UPDATE", "DELETE")
+]
+
+
+# Primary key columns of each versioned table, for the deleted_row log
+PRIMARY_KEYS = {
+    "league": ["league_id"],
+    "team": ["team_id"],
+    "player": ["player_id"],
+    "team_player": ["team_id", "player_id"],
+    "performance": ["performance_id"],
+}
+
+
+def row_key(table_name: str, row: str) -> str:
+    """Returns an expression for the primary key of the OLD or NEW row, or
+    of a row of the table, as a JSON object"""
+    return "json_object(" + ", ".join(
+        f"'{column}', {row}.{column}" for column in PRIMARY_KEYS[table_name]
+    ) + ")"
+
+
+def log_deleted_row(table_name: str, row: str) -> str:
+    """Returns a statement that records the OLD row as deleted today"""
+    return (
+        f"INSERT OR REPLACE INTO deleted_row VALUES ('{table_name}', "
+        f"{row_key(table_name, row)}, date('now'))"
+    )
+
+
+def forget_deleted_row(table_name: str, row: str) -> str:
+    """Returns a statement that removes the NEW row from the deleted rows"""
+    return (
+        f"DELETE FROM deleted_row WHERE table_name = '{table_name}' "
+        f"AND row_key = {row_key(table_name, row)}"
+    )
+
+
+# Triggers that log every deleted row for the changes feed, and forget it
+# again when a row with its key is inserted. A new primary key counts as
+# a delete of the old one.
+DELETED_ROW_TRIGGERS = [
+    statement
+    for table_name in VERSIONED_TABLES
+    for statement in (
+        f"CREATE TRIGGER {table_name}_delete_deleted_row "
+        f"AFTER DELETE ON {table_name} BEGIN "
+        + log_deleted_row(table_name, "OLD") + "; END",
+        f"CREATE TRIGGER {table_name}_insert_deleted_row "
+        f"AFTER INSERT ON {table_name} BEGIN "
+        + forget_deleted_row(table_name, "NEW") + "; END",
+        f"CREATE TRIGGER {table_name}_update_deleted_row "
+        f"AFTER UPDATE OF {', '.join(PRIMARY_KEYS[table_name])} "
+        f"ON {table_name} WHEN {row_key(table_name, 'OLD')} "
+        f"!= {row_key(table_name, 'NEW')} BEGIN "
+        + log_deleted_row(table_name, "OLD") + "; "
+        + forget_deleted_row(table_name, "NEW") + "; END",
+    )
+]
+
+
+# Each entry is a description and the SQL statements that migrate to it.
+# Never edit a migration that has shipped. Add a new one instead.
+MIGRATIONS = [
+    (
+        "Add indexes for the filter columns used by crud.py",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_player_last_changed_date "
+            "ON player (last_changed_date)",
+            "CREATE INDEX IF NOT EXISTS ix_player_first_name "
+            "ON player (first_name)",
+            "CREATE INDEX IF NOT EXISTS ix_player_last_name_first_name "
+            "ON player (last_name, first_name)",
+            "CREATE INDEX IF NOT EXISTS ix_performance_last_changed_date "
+            "ON performance (last_changed_date)",
+            "CREATE INDEX IF NOT EXISTS ix_performance_player_id_week_number "
+            "ON performance (player_id, week_number)",
+            "CREATE INDEX IF NOT EXISTS ix_league_last_changed_date "
+            "ON league (last_changed_date)",
+            "CREATE INDEX IF NOT EXISTS ix_league_league_name "
+            "ON league (league_name)",
+            "CREATE INDEX IF NOT EXISTS ix_team_last_changed_date "
+            "ON team (last_changed_date)",
+            "CREATE INDEX IF NOT EXISTS ix_team_team_name "
+            "ON team (team_name)",
+            "CREATE INDEX IF NOT EXISTS ix_team_league_id_team_name "
+            "ON team (league_id, team_name)",
+            "CREATE INDEX IF NOT EXISTS ix_team_player_last_changed_date "
+            "ON team_player (last_changed_date)",
+            "CREATE INDEX IF NOT EXISTS ix_team_player_player_id "
+            "ON team_player (player_id)",
+        ],
+    ),
+    (
+        "Add player_week_points, kept up to date by triggers on performance",
+        [
+            "CREATE TABLE player_week_points ("
+            "player_id INTEGER NOT NULL, "
+            "week_number INTEGER NOT NULL, "
+            "position VARCHAR NOT NULL, "
+            "fantasy_points FLOAT NOT NULL, "
+            "performance_count INTEGER NOT NULL, "
+            "last_changed_date DATE NOT NULL, "
+            "PRIMARY KEY (player_id, week_number))",
+            "CREATE INDEX ix_player_week_points_week_number_position "
+            "ON player_week_points "
+            "(week_number, position, player_id, fantasy_points)",
+            "CREATE INDEX ix_player_week_points_last_changed_date "
+            "ON player_week_points (last_changed_date)",
+            "INSERT INTO player_week_points " + PLAYER_WEEK_POINTS_SELECT
+            + " GROUP BY performance.player_id, performance.week_number",
+            *PERFORMANCE_TRIGGERS,
+            "CREATE TRIGGER player_update_player_week_points "
+            "AFTER UPDATE OF position ON player BEGIN "
+            "UPDATE player_week_points SET position = NEW.position "
+            "WHERE player_id = NEW.player_id; END",
+        ],
+    ),
+    (
+        "Store performance.week_number as an INTEGER and index it",
+        [
+            "CREATE TABLE performance_new ("
+            "performance_id INTEGER NOT NULL, "
+            "week_number INTEGER NOT NULL, "
+            "fantasy_points FLOAT NOT NULL, "
+            "player_id INTEGER NOT NULL, "
+            "last_changed_date DATE NOT NULL, "
+            "PRIMARY KEY (performance_id), "
+            "FOREIGN KEY(player_id) REFERENCES player (player_id))",
+            "INSERT INTO performance_new SELECT performance_id, "
+            "CAST(week_number AS INTEGER), fantasy_points, player_id, "
+            "last_changed_date FROM performance",
+            # dropping the table drops its indexes and triggers too
+            "DROP TABLE performance",
+            "ALTER TABLE performance_new RENAME TO performance",
+            "CREATE INDEX ix_performance_last_changed_date "
+            "ON performance (last_changed_date)",
+            "CREATE INDEX ix_performance_player_id_week_number "
+            "ON performance (player_id, week_number)",
+            "CREATE INDEX ix_performance_week_number "
+            "ON performance (week_number)",
+            *PERFORMANCE_TRIGGERS,
+        ],
+    ),
+    (
+        "Add player_fts, a full-text index of player names kept up to date "
+        "by triggers on player",
+        [
+            "CREATE VIRTUAL TABLE player_fts USING fts5("
+            "first_name, last_name, content='player', "
+            "content_rowid='player_id', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+            "INSERT INTO player_fts (player_fts) VALUES ('rebuild')",
+            "CREATE TRIGGER player_insert_player_fts "
+            "AFTER INSERT ON player BEGIN "
+            "INSERT INTO player_fts (rowid, first_name, last_name) "
+            "VALUES (NEW.player_id, NEW.first_name, NEW.last_name); END",
+            "CREATE TRIGGER player_delete_player_fts "
+            "AFTER DELETE ON player BEGIN "
+            "INSERT INTO player_fts (player_fts, rowid, first_name, last_name) "
+            "VALUES ('delete', OLD.player_id, OLD.first_name, OLD.last_name); "
+            "END",
+            "CREATE TRIGGER player_update_player_fts "
+            "AFTER UPDATE OF player_id, first_name, last_name ON player BEGIN "
+            "INSERT INTO player_fts (player_fts, rowid, first_name, last_name) "
+            "VALUES ('delete', OLD.player_id, OLD.first_name, OLD.last_name); "
+            "INSERT INTO player_fts (rowid, first_name, last_name) "
+            "VALUES (NEW.player_id, NEW.first_name, NEW.last_name); END",
+        ],
+    ),
+    (
+        "Add table_version, a change counter of each table kept up to date "
+        "by triggers",
+        [
+            "CREATE TABLE table_version ("
+            "table_name VARCHAR NOT NULL, "
+            "version INTEGER NOT NULL, "
+            "changed_at INTEGER NOT NULL, "
+            "PRIMARY KEY (table_name))",
+            "INSERT INTO table_version "
+            "SELECT name, 1, CAST(strftime('%s', 'now') AS INTEGER) "
+            "FROM sqlite_master WHERE type = 'table' AND name IN ("
+            + ", ".join(f"'{table_name}'" for table_name in VERSIONED_TABLES)
+            + ")",
+            *TABLE_VERSION_TRIGGERS,
+        ],
+    ),
+    (
+        "Add player_cumulative_points, kept up to date by triggers on "
+        "player_week_points, and drop the week index it replaces",
+        [
+            "CREATE TABLE player_cumulative_points ("
+            "player_id INTEGER NOT NULL, "
+            "week_number INTEGER NOT NULL, "
+            "position VARCHAR NOT NULL, "
+            "fantasy_points FLOAT NOT NULL, "
+            "week_count INTEGER NOT NULL, "
+            "PRIMARY KEY (player_id, week_number))",
+            "CREATE INDEX ix_player_cumulative_points_week_number_position "
+            "ON player_cumulative_points "
+            "(week_number, position, player_id, fantasy_points, week_count)",
+            "INSERT INTO player_cumulative_points "
+            + PLAYER_CUMULATIVE_POINTS_SELECT,
+            *PLAYER_WEEK_POINTS_TRIGGERS,
+            "DROP INDEX ix_player_week_points_week_number_position",
+        ],
+    ),
+    (
+        "Add deleted_row, a log of deleted rows kept by triggers, so the "
+        "changes feed can send deletes",
+        [
+            "CREATE TABLE deleted_row ("
+            "table_name VARCHAR NOT NULL, "
+            "row_key VARCHAR NOT NULL, "
+            "deleted_date DATE NOT NULL, "
+            "PRIMARY KEY (table_name, row_key))",
+            "CREATE INDEX ix_deleted_row_table_name_deleted_date "
+            "ON deleted_row (table_name, deleted_date)",
+            *DELETED_ROW_TRIGGERS,
+        ],
+    ),
+]
+
+
+def get_version(connection: sqlite3.Connection) -> int:
+    return connection.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(database_file: str = DATABASE_FILE) -> int:
+    """Applies every migration the database doesn't have yet.
+
+    Returns the number of migrations applied.
+    """
+    connection = sqlite3.connect(database_file, isolation_level=None)
+    try:
+        version = get_version(connection)
+        for number, (description, statements) in enumerate(
+                MIGRATIONS[version:], start=version + 1):
+            print(f"Applying migration {number}: {description}")
+            connection.execute("BEGIN")
+            try:
+                for statement in statements:
+                    connection.execute(statement)
+                connection.execute(f"PRAGMA user_version = {number}")
+                connection.execute("COMMIT")
+            except sqlite3.Error:
+                connection.execute("ROLLBACK")
+                raise
+        return len(MIGRATIONS) - min(version, len(MIGRATIONS))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate an SWC database")
+    parser.add_argument("database_file", nargs="?", default=DATABASE_FILE)
+    args = parser.parse_args()
+    applied = migrate(args.database_file)
+    print(f"Applied {applied} migrations to {args.database_file}")
@@ -1,5 +1,5 @@
 """SQLAlchemy models"""
-from sqlalchemy import Column, ForeignKey, Integer, String, Float, Date
+from sqlalchemy import Column, ForeignKey, Integer, String, Float, Date, Index
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -10,10 +10,10 @@ class Player(Base):
 
     player_id = Column(Integer, primary_key=True, index=True)
     gsis_id = Column(String, nullable=True)
-    first_name = Column(String, nullable=False)
+    first_name = Column(String, nullable=False, index=True)
     last_name = Column(String, nullable=False)
     position = Column(String, nullable=False)
-    last_changed_date = Column(Date, nullable=False)
+    last_changed_date = Column(Date, nullable=False, index=True)
 
     performances = relationship("Performance", back_populates="player")
 
@@ -22,27 +22,36 @@ class Player(Base):
     teams = relationship("Team", secondary="team_player", 
                          back_populates="players")    
 
+    __table_args__ = (
+        Index("ix_player_last_name_first_name", "last_name", "first_name"),
+    )
+
 
 class Performance(Base):
     __tablename__ = "performance"
 
     performance_id = Column(Integer, primary_key=True, index=True)
-    week_number = Column(String, nullable=False)
+    week_number = Column(Integer, nullable=False, index=True)
     fantasy_points = Column(Float, nullable=False)
-    last_changed_date = Column(Date, nullable=False)
+    last_changed_date = Column(Date, nullable=False, index=True)
 
     player_id = Column(Integer, ForeignKey("player.player_id"))
 
     player = relationship("Player", back_populates="performances")
 
+    __table_args__ = (
+        Index("ix_performance_player_id_week_number", 
+              "player_id", "week_number"),
+    )
+
 
 class League(Base):
     __tablename__ = "league"
 
     league_id = Column(Integer, primary_key=True, index=True)
-    league_name = Column(String, nullable=False)
+    league_name = Column(String, nullable=False, index=True)
     scoring_type = Column(String, nullable=False)
-    last_changed_date = Column(Date, nullable=False)
+    last_changed_date = Column(Date, nullable=False, index=True)
 
     teams = relationship("Team", back_populates="league")
 
@@ -51,8 +60,8 @@ class Team(Base):
     __tablename__ = "team"
 
     team_id = Column(Integer, primary_key=True, index=True)
-    team_name = Column(String, nullable=False)
-    last_changed_date = Column(Date, nullable=False)    
+    team_name = Column(String, nullable=False, index=True)
+    last_changed_date = Column(Date, nullable=False, index=True)
 
     league_id = Column(Integer, ForeignKey("league.league_id"))
 
@@ -61,6 +70,10 @@ class Team(Base):
     players = relationship("Player", secondary="team_player", 
                            back_populates="teams")
 
+    __table_args__ = (
+        Index("ix_team_league_id_team_name", "league_id", "team_name"),
+    )
+
 class TeamPlayer(Base):
     __tablename__ = "team_player"
 
@@ -68,4 +81,79 @@ class TeamPlayer(Base):
                      primary_key=True, index=True)
     player_id = Column(Integer, ForeignKey("player.player_id"), 
                        primary_key=True, index=True)
-    last_changed_date = Column(Date, nullable=False)    
+    last_changed_date = Column(Date, nullable=False, index=True)
+
+
+class PlayerWeekPoints(Base):
+    """Fantasy points of each player and week, summed from performance.
+
+    Triggers added by migrations.py keep it up to date, so don't write to 
+    it directly.
+    """
+    __tablename__ = "player_week_points"
+
+    player_id = Column(Integer, ForeignKey("player.player_id"), 
+                       primary_key=True)
+    week_number = Column(Integer, primary_key=True)
+    position = Column(String, nullable=False)
+    fantasy_points = Column(Float, nullable=False)
+    performance_count = Column(Integer, nullable=False)
+    last_changed_date = Column(Date, nullable=False, index=True)
+
+
+class PlayerCumulativePoints(Base):
+    """Fantasy points of each player summed over every week up to and 
+    including a week, and the number of those weeks with points.
+
+    Every player in player_week_points has a row for every week in it, so 
+    the points in a range of weeks are the difference of two rows. 
+    Triggers added by migrations.py keep it up to date, so don't write to 
+    it directly.
+    """
+    __tablename__ = "player_cumulative_points"
+
+    player_id = Column(Integer, ForeignKey("player.player_id"), 
+                       primary_key=True)
+    week_number = Column(Integer, primary_key=True)
+    position = Column(String, nullable=False)
+    fantasy_points = Column(Float, nullable=False)
+    week_count = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_player_cumulative_points_week_number_position", 
+              "week_number", "position", "player_id", "fantasy_points", 
+              "week_count"),
+    )
+
+
+class TableVersion(Base):
+    """Change counter of each table, raised on every insert, update and
+    delete by triggers added by migrations.py.
+
+    changed_at is the Unix time of the latest change, in seconds.
+    """
+    __tablename__ = "table_version"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+    changed_at = Column(Integer, nullable=False)
+
+
+class DeletedRow(Base):
+    """Primary key of each deleted row and the date it was deleted, for 
+    the changes feed.
+
+    row_key is the primary key as a JSON object. Triggers added by 
+    migrations.py add a row on delete and remove it when the key is 
+    inserted again.
+    """
+    __tablename__ = "deleted_row"
+
+    table_name = Column(String, primary_key=True)
+    row_key = Column(String, primary_key=True)
+    deleted_date = Column(Date, nullable=False)
+
+    __table_args__ = (
+        Index("ix_deleted_row_table_name_deleted_date", "table_name", 
+              "deleted_date"),
+    )
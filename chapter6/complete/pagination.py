@@ -0,0 +1,63 @@
+"""Keyset (cursor) pagination helpers"""
+import base64
+import json
+from datetime import date
+
+from sqlalchemy import Date, tuple_
+
+
+def encode_cursor(key: list) -> str:
+    """Turns the sort key of the last row on a page into an opaque cursor"""
+    values = [value.isoformat() if isinstance(value, date) else value
+              for value in key]
+    payload = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_columns: list) -> list:
+    """Turns an opaque cursor back into sort key values.
+
+    Raises ValueError if the cursor is malformed or was issued for a
+    different sort key, such as a request with other filters.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != len(key_columns):
+        raise ValueError("Cursor does not match this query")
+    try:
+        return [date.fromisoformat(value) if isinstance(column.type, Date)
+                else value for column, value in zip(key_columns, values)]
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def paginate(query, key_columns: list, skip: int = 0, limit: int = 100,
+             cursor: str = None):
+    """Orders a query by its sort key and applies one page to it.
+
+    With a cursor the page starts right after the row the cursor was
+    issued for, so the database seeks through the index instead of
+    reading and discarding every skipped row. Skip is ignored then.
+    """
+    query = query.order_by(*key_columns)
+    if cursor:
+        key = decode_cursor(cursor, key_columns)
+        if len(key_columns) == 1:
+            query = query.filter(key_columns[0] > key[0])
+        else:
+            query = query.filter(tuple_(*key_columns) > tuple_(*key))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+
+def next_cursor(rows: list, key_columns: list, limit: int):
+    """Returns the cursor for the page after rows, or None on the last page"""
+    if not rows or len(rows) < limit:
+        return None
+    last_row = rows[-1]
+    return encode_cursor([getattr(last_row, column.key)
+                          for column in key_columns])
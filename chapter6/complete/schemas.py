@@ -1,6 +1,6 @@
 """Pydantic schemas"""
-from pydantic import BaseModel, ConfigDict
-from typing import List
+from pydantic import BaseModel, ConfigDict, field_validator
+from typing import List, Optional
 from datetime import date
 
 
@@ -11,7 +11,14 @@ class Performance(BaseModel):
     week_number : str
     fantasy_points : float
     last_changed_date : date
-        
+
+    @field_validator("week_number", mode="before")
+    @classmethod
+    def week_number_as_string(cls, week_number):
+        """Week numbers are stored as integers but the API has always 
+        returned them as strings"""
+        return str(week_number)
+
 
 
 class PlayerBase(BaseModel):
@@ -27,6 +34,17 @@ class Player(PlayerBase):
     model_config = ConfigDict(from_attributes = True)
     performances: List[Performance] = []
 
+class PlayerBatchItem(BaseModel):
+    player_id : int
+    found : bool
+    player : Optional[Player] = None
+
+class PlayerBatch(BaseModel):
+    players: List[PlayerBatchItem]
+
+class PlayerBatchRequest(BaseModel):
+    ids: List[int]
+
 
 class TeamBase(BaseModel):
     model_config = ConfigDict(from_attributes = True)
@@ -40,15 +58,43 @@ class Team(TeamBase):
     players: List[PlayerBase] = []
 
 
-class League(BaseModel):
+class LeagueBase(BaseModel):
     model_config = ConfigDict(from_attributes = True)
     league_id : int
     league_name : str
     scoring_type : str
     last_changed_date : date
+
+class League(LeagueBase):
+    model_config = ConfigDict(from_attributes = True)
     teams: List[TeamBase] = []
 
+class LeaderboardEntry(BaseModel):
+    player_id : int
+    first_name : str
+    last_name : str
+    position : str
+    fantasy_points : float
+    week_count : int
+
+class TeamWeekPoints(BaseModel):
+    week_number : str
+    fantasy_points : float
+
+    @field_validator("week_number", mode="before")
+    @classmethod
+    def week_number_as_string(cls, week_number):
+        return str(week_number)
+
+class TeamStanding(BaseModel):
+    rank : int
+    team_id : int
+    team_name : str
+    fantasy_points : float
+    weeks: List[TeamWeekPoints] = []
+
 class Counts(BaseModel):
     league_count : int
     team_count : int
     player_count : int
+    performance_count : int
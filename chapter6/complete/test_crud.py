@@ -1,9 +1,20 @@
 """Testing SQLAlchemy Helper Functions"""
 import pytest
+import re
+import shutil
+import sqlite3
 from datetime import date
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
 
+import bulk_load
+import cache
 import crud
-from database import SessionLocal
+import generate_data
+import migrations
+from database import DATABASE_FILE, SessionLocal, apply_profile
+from pagination import next_cursor
 
 # use a test date of 4/1/2024 to test the min_last_changed_date.
 test_date = date(2024,4,1)
@@ -32,6 +43,39 @@ def test_get_players_by_name(db_session):
     assert len(players) == 1
     assert players[0].player_id == 2009
 
+def test_get_players_by_ids(db_session):
+    """Tests that a batch of IDs returns only the players that exist"""
+    players = crud.get_players_by_ids(db_session, [1001, 2009, 99999])
+    assert sorted(players) == [1001, 2009]
+    assert len(players[2009].performances) > 0
+
+def test_search_players(db_session):
+    """Tests that each word matches the start of a first or last name"""
+    players = crud.search_players(db_session, "bry YOU")
+    assert [player.player_id for player in players] == [2009]
+    assert crud.search_players(db_session, '"*') == []
+
+def test_player_fts_follows_players(tmp_path):
+    """Tests that the triggers keep player_fts in step with player"""
+    database_file = tmp_path / "fantasy_data.db"
+    shutil.copy(DATABASE_FILE, database_file)
+    connection = sqlite3.connect(database_file)
+    search = ("SELECT rowid FROM player_fts WHERE player_fts MATCH ? "
+              "ORDER BY rowid")
+    connection.execute("UPDATE player SET last_name = 'Zzyzx' "
+                       "WHERE player_id = 2009")
+    assert connection.execute(search, ('"zzy"*',)).fetchall() == [(2009,)]
+    assert connection.execute(search, ('"young"',)).fetchall() != [(2009,)]
+    connection.execute("DELETE FROM player WHERE player_id = 2009")
+    assert connection.execute(search, ('"zzy"*',)).fetchall() == []
+    connection.close()
+
+def test_get_players_without_performances(db_session):
+    """Tests that performances are not loaded unless asked for"""
+    players = crud.get_players(db_session, first_name="Bryce", 
+                               last_name="Young", include_performances=False)
+    assert "performances" not in players[0].__dict__
+
 
 def test_get_all_performances(db_session):
     """Tests that the count of performances in the database is 
@@ -46,6 +90,35 @@ def test_get_new_performances(db_session):
                                          min_last_changed_date=test_date)
     assert len(performances) == 2711
 
+def test_get_performances_for_one_week(db_session):
+    """Tests the week range filter on the integer week_number"""
+    performances = crud.get_performances(db_session, limit=18000,
+                                         min_week=202305, max_week=202305)
+    assert len(performances) == 1018
+    assert {p.week_number for p in performances} == {202305}
+
+def test_get_performances_by_cursor(db_session):
+    """Tests that cursor pages line up with offset pages"""
+    first_page = crud.get_performances(db_session, skip=0, limit=100, 
+                                       min_last_changed_date=test_date)
+    cursor = next_cursor(first_page, 
+                         crud.performance_page_keys(test_date), 100)
+    cursor_page = crud.get_performances(db_session, limit=100, 
+                                        min_last_changed_date=test_date, 
+                                        cursor=cursor)
+    offset_page = crud.get_performances(db_session, skip=100, limit=100, 
+                                        min_last_changed_date=test_date)
+    assert [p.performance_id for p in cursor_page] == \
+        [p.performance_id for p in offset_page]
+
+def test_get_performances_bad_cursor(db_session):
+    """Tests that a cursor from a different filter is rejected"""
+    first_page = crud.get_performances(db_session, limit=10)
+    cursor = next_cursor(first_page, crud.performance_page_keys(), 10)
+    with pytest.raises(ValueError):
+        crud.get_performances(db_session, limit=10, 
+                              min_last_changed_date=test_date, cursor=cursor)
+
 def test_get_league(db_session):
     """Tests you can get a league"""
     league = crud.get_league(db_session, league_id = 5002)
@@ -76,6 +149,20 @@ def test_get_team_players(db_session):
     first_team = crud.get_teams(db_session, skip=0, limit=1000, min_last_changed_date=test_date)[0]
     assert len(first_team.players) == 7
 
+def test_get_league_standings(db_session):
+    """Tests the standings against sums of the performance table"""
+    standings = crud.get_league_standings(db_session, league_id=5002)
+    assert [standing["rank"] for standing in standings] == list(range(1, 9))
+    expected = dict(db_session.execute(text(
+        "SELECT team_player.team_id, sum(performance.fantasy_points) "
+        "FROM team_player JOIN team USING (team_id) "
+        "JOIN performance USING (player_id) "
+        "WHERE team.league_id = 5002 GROUP BY team_player.team_id")).all())
+    assert {standing["team_id"]: standing["fantasy_points"] 
+            for standing in standings} == expected
+    assert sum(week["fantasy_points"] for week in standings[0]["weeks"]) == \
+        standings[0]["fantasy_points"]
+
 #test the count functions
 def test_get_player_count(db_session):
     player_count = crud.get_player_count(db_session)
@@ -87,4 +174,332 @@ def test_get_team_count(db_session):
 
 def test_get_league_count(db_session):
     league_count = crud.get_league_count(db_session)
-    assert league_count == 5
\ No newline at end of file
+    assert league_count == 5
+
+def test_get_counts(db_session):
+    counts = crud.get_counts(db_session)
+    assert counts.league_count == 5
+    assert counts.team_count == 20
+    assert counts.player_count == 1018
+    assert counts.performance_count == 17306
+
+def test_get_cached_counts(db_session):
+    """Tests that counts come from the cache until a table changes"""
+    counts = crud.get_cached_counts(db_session)
+    assert crud.get_cached_counts(db_session) is counts
+    crud._counts_cache["version"] = None
+    assert crud.get_cached_counts(db_session) is not counts
+
+def test_cached_counts_see_changes(tmp_path):
+    """Tests that inserts and deletes are counted at once, whatever their 
+    change date and key"""
+    database_file = tmp_path / "fantasy_data.db"
+    shutil.copy(DATABASE_FILE, database_file)
+    copy_engine = create_engine(f"sqlite:///{database_file}")
+    crud._counts_cache["version"] = None
+    with Session(copy_engine) as session:
+        assert crud.get_cached_counts(session).player_count == 1018
+        latest = session.execute(
+            text("SELECT max(last_changed_date) FROM player")).scalar()
+        session.execute(text(
+            "INSERT INTO player (player_id, gsis_id, first_name, last_name, "
+            "position, last_changed_date) VALUES (99999, '00-9999999', "
+            "'New', 'Player', 'QB', :latest)"), {"latest": latest})
+        assert crud.get_cached_counts(session).player_count == 1019
+        session.execute(text("DELETE FROM player WHERE player_id = 1001"))
+        assert crud.get_cached_counts(session).player_count == 1018
+    crud._counts_cache["version"] = None
+    copy_engine.dispose()
+
+def test_read_profile(tmp_path):
+    """Tests that the read profile sets its PRAGMAs and blocks writes"""
+    database_file = tmp_path / "fantasy_data.db"
+    shutil.copy(DATABASE_FILE, database_file)
+    read_engine = apply_profile(
+        create_engine(f"sqlite:///{database_file}"), "read")
+    with read_engine.connect() as connection:
+        assert connection.execute(
+            text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA query_only")).scalar() == 1
+        assert connection.execute(
+            text("SELECT count(*) FROM league")).scalar() == 5
+        with pytest.raises(OperationalError):
+            connection.execute(text("DELETE FROM league"))
+    read_engine.dispose()
+
+def test_migrations_are_applied(tmp_path):
+    """Tests that the bundled database has every migration, and that 
+    running them again changes nothing"""
+    database_file = tmp_path / "fantasy_data.db"
+    shutil.copy(DATABASE_FILE, database_file)
+    assert migrations.migrate(str(database_file)) == 0
+
+
+def test_player_week_points_follow_performances(tmp_path):
+    """Tests that the triggers keep player_week_points in step when 
+    performances are added, changed and deleted"""
+    database_file = tmp_path / "fantasy_data.db"
+    shutil.copy(DATABASE_FILE, database_file)
+    connection = sqlite3.connect(database_file)
+    totals = ("SELECT (SELECT sum(fantasy_points) FROM performance), "
+              "(SELECT sum(fantasy_points) FROM player_week_points)")
+    connection.execute(
+        "INSERT INTO performance (performance_id, week_number, fantasy_points, "
+        "player_id, last_changed_date) VALUES (99999, '202318', 5, 1001, "
+        "'2024-06-01')")
+    connection.execute("UPDATE performance SET fantasy_points = 7, "
+                       "week_number = '202319' WHERE performance_id = 99999")
+    assert connection.execute(
+        "SELECT week_number, fantasy_points FROM player_week_points "
+        "WHERE player_id = 1001 AND week_number > 202317").fetchall() == \
+        [(202319, 7.0)]
+    total_points, week_points = connection.execute(totals).fetchone()
+    assert total_points == week_points
+    connection.execute("DELETE FROM performance WHERE performance_id = 99999")
+    assert connection.execute(
+        "SELECT count(*) FROM player_week_points "
+        "WHERE week_number > 202317").fetchone()[0] == 0
+    connection.close()
+
+def test_cumulative_points_follow_week_points(tmp_path):
+    """Tests that the triggers keep a row of player_cumulative_points for 
+    every player and week, with the totals up to that week"""
+    database_file = tmp_path / "fantasy_data.db"
+    shutil.copy(DATABASE_FILE, database_file)
+    connection = sqlite3.connect(database_file)
+    connection.execute(
+        "INSERT INTO player (player_id, gsis_id, first_name, last_name, "
+        "position, last_changed_date) VALUES (99999, '00-9999999', 'New', "
+        "'Player', 'QB', '2024-06-01')")
+    connection.executemany(
+        "INSERT INTO performance (performance_id, week_number, fantasy_points, "
+        "player_id, last_changed_date) VALUES (?, ?, ?, ?, '2024-06-01')",
+        [(99998, "202318", 5, 1001), (99999, "202305", 9, 99999)])
+    connection.execute("UPDATE performance SET fantasy_points = 4 "
+                       "WHERE performance_id = 99998")
+    rebuilt = ("SELECT count(*) FROM (SELECT * FROM player_cumulative_points "
+               f"EXCEPT {migrations.PLAYER_CUMULATIVE_POINTS_SELECT})")
+    assert connection.execute(rebuilt).fetchone()[0] == 0
+    assert connection.execute(
+        "SELECT count(*) FROM player_cumulative_points").fetchone()[0] == \
+        connection.execute(
+            "SELECT count(DISTINCT player_id) * count(DISTINCT week_number) "
+            "FROM player_week_points").fetchone()[0]
+    assert connection.execute(
+        "SELECT fantasy_points, week_count FROM player_cumulative_points "
+        "WHERE player_id = 99999 AND week_number = 202318").fetchone() == \
+        (9.0, 1)
+    connection.close()
+
+@pytest.mark.parametrize("min_week,max_week,position", [
+    (202301, 202310, "QB"),
+    (202305, 202312, "WR"),
+    (202310, 202399, "RB"),
+])
+def test_get_leaderboard(db_session, min_week, max_week, position):
+    """Tests the leaderboard against sums of the performance table"""
+    leaders = crud.get_leaderboard(db_session, min_week=min_week, 
+                                   max_week=max_week, position=position, 
+                                   limit=5)
+    assert len(leaders) == 5
+    expected = db_session.execute(text(
+        "SELECT performance.player_id, sum(fantasy_points) AS points, "
+        "count(DISTINCT week_number) FROM performance "
+        "JOIN player USING (player_id) "
+        "WHERE week_number BETWEEN :min_week AND :max_week "
+        "AND position = :position GROUP BY performance.player_id "
+        "ORDER BY points DESC, performance.player_id LIMIT 5"), 
+        {"min_week": str(min_week), "max_week": str(max_week), 
+         "position": position}).all()
+    assert [(leader.player_id, leader.fantasy_points, leader.week_count) 
+            for leader in leaders] == [tuple(row) for row in expected]
+
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_bulk_load(tmp_path, file_format):
+    """Tests that loading the bulk files rebuilds the bundled data, with 
+    its indexes, triggers and derived tables"""
+    if file_format == "parquet":
+        pytest.importorskip("pyarrow")
+    database_file = str(tmp_path / "fantasy_data.db")
+    counts = bulk_load.bulk_load(database_file, file_format=file_format)
+    assert counts == {"league": 5, "team": 20, "player": 1018,
+                      "team_player": 140, "performance": 17306}
+    assert migrations.migrate(database_file) == 0
+    connection = sqlite3.connect(database_file)
+    connection.execute("ATTACH ? AS bundled", (DATABASE_FILE,))
+    for table, columns in [("performance", "*"), ("player_week_points", "*"),
+                           ("player_cumulative_points", "*"),
+                           ("sqlite_master", "type, name, sql")]:
+        assert connection.execute(
+            f"SELECT count(*) FROM (SELECT {columns} FROM main.{table} "
+            f"EXCEPT SELECT {columns} FROM bundled.{table})").fetchone()[0] == 0
+    assert connection.execute(
+        "SELECT rowid FROM player_fts WHERE player_fts MATCH 'bryce young'"
+        ).fetchall() == [(2009,)]
+    connection.close()
+
+def test_deleted_rows_are_logged(tmp_path):
+    """Tests that deletes, including rows a bulk load drops, are logged 
+    for the changes feed, and forgotten when the row comes back"""
+    database_file = str(tmp_path / "fantasy_data.db")
+    shutil.copy(DATABASE_FILE, database_file)
+    connection = sqlite3.connect(database_file)
+    deleted_keys = "SELECT table_name, row_key FROM deleted_row"
+    connection.execute("DELETE FROM league WHERE league_id = 5001")
+    connection.commit()
+    assert connection.execute(deleted_keys).fetchall() == \
+        [("league", '{"league_id":5001}')]
+    connection.execute(
+        "INSERT INTO league (league_id, league_name, scoring_type, "
+        "last_changed_date) VALUES (9999, 'Extra League', 'PPR', "
+        "'2024-06-01')")
+    connection.commit()
+    bulk_load.bulk_load(database_file)
+    assert connection.execute(deleted_keys).fetchall() == \
+        [("league", '{"league_id":9999}')]
+    connection.close()
+
+def test_generate_data(tmp_path):
+    """Tests that generated data has the bundled shape at a multiple of its 
+    size, is the same for the same seed, and loads"""
+    counts = generate_data.generate(str(tmp_path / "first"), multiplier=2)
+    assert counts == {"league_data": 10, "team_data": 40, 
+                      "player_data": 2036, "team_player_data": 280,
+                      "performance_data": 34612}
+    generate_data.generate(str(tmp_path / "second"), multiplier=2)
+    for file_name in counts:
+        assert (tmp_path / "first" / f"{file_name}.csv").read_bytes() == \
+            (tmp_path / "second" / f"{file_name}.csv").read_bytes()
+    database_file = str(tmp_path / "fantasy_data.db")
+    bulk_load.bulk_load(database_file, str(tmp_path / "first"))
+    connection = sqlite3.connect(database_file)
+    assert connection.execute(
+        "SELECT count(*) FROM (SELECT DISTINCT team.league_id, player_id "
+        "FROM team_player JOIN team USING (team_id))").fetchone()[0] == 280
+    connection.close()
+
+#test the cache in front of the crud functions
+@pytest.fixture(scope="function")
+def crud_cache():
+    return cache.CrudCache(cache.MemoryBackend(max_entries=2), ttl=60)
+
+def test_cache_hits_for_same_parameters(db_session, crud_cache):
+    """Tests that parameters passed differently share one cache entry"""
+    get_teams = crud_cache.cached(crud.get_teams, namespace="teams")
+    teams = get_teams(db_session, league_id=5001)
+    assert get_teams(db_session, 0, 100, league_id=5001) is teams
+    assert len(teams) == 12
+    assert crud_cache.stats()["teams"] == {"hits": 1, "misses": 1}
+
+def test_cache_evicts_least_recently_used(db_session, crud_cache):
+    get_league = crud_cache.cached(crud.get_league, namespace="leagues")
+    first = get_league(db_session, league_id=5001)
+    get_league(db_session, league_id=5002)
+    get_league(db_session, league_id=5001)
+    get_league(db_session, league_id=5003)
+    assert get_league(db_session, league_id=5001) is first
+    assert crud_cache.stats()["leagues"] == {"hits": 2, "misses": 3}
+    get_league(db_session, league_id=5002)
+    assert crud_cache.stats()["leagues"]["misses"] == 4
+
+def test_cache_expires_entries(db_session, crud_cache):
+    crud_cache.ttl = 0
+    get_leagues = crud_cache.cached(crud.get_leagues, namespace="leagues")
+    leagues = get_leagues(db_session)
+    assert get_leagues(db_session) is not leagues
+
+def test_cache_version(db_session, crud_cache):
+    """Tests that a new version skips the entries of the old one"""
+    get_leagues = crud_cache.cached(crud.get_leagues, namespace="leagues")
+    leagues = get_leagues(db_session, version=1)
+    assert get_leagues(db_session, version=1) is leagues
+    assert get_leagues(db_session, version=2) is not leagues
+
+def test_redis_backend(db_session, monkeypatch):
+    """Tests the Redis backend against an in-memory Redis"""
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = pytest.importorskip("redis")
+    monkeypatch.setattr(redis, "Redis", fakeredis.FakeRedis)
+    backend = cache.RedisBackend("redis://localhost:6379/0")
+    assert backend.get("leagues:missing") == (False, None)
+    crud_cache = cache.CrudCache(backend, ttl=60)
+    get_league = crud_cache.cached(crud.get_league, namespace="leagues")
+    league = get_league(db_session, league_id=5002, version=1)
+    cached_league = get_league(db_session, league_id=5002, version=1)
+    assert cached_league is not league
+    assert [team.team_id for team in cached_league.teams] == \
+        [team.team_id for team in league.teams]
+    assert crud_cache.stats()["leagues"] == {"hits": 1, "misses": 1}
+    key, = backend.client.keys("swc:cache:leagues:*")
+    assert 0 < backend.client.pttl(key) <= 60000
+
+
+#test that filtered queries use indexes
+FULL_SCAN = re.compile(r"^SCAN (player|performance|league|team|team_player"
+                       r"|player_week_points|player_cumulative_points)\b")
+
+@pytest.mark.parametrize("crud_function,kwargs", [
+    (crud.get_player, {"player_id": 1001}),
+    (crud.get_players, {"first_name": "Bryce", "last_name": "Young"}),
+    (crud.get_players, {"first_name": "Bryce"}),
+    (crud.get_players, {"min_last_changed_date": test_date}),
+    (crud.search_players, {"q": "jos al"}),
+    (crud.get_performances, {"min_last_changed_date": test_date}),
+    (crud.get_performances, {"min_week": 202305, "max_week": 202306}),
+    (crud.get_league, {"league_id": 5002}),
+    (crud.get_leagues, {"league_name": "Pigskin Prodigal Fantasy League"}),
+    (crud.get_leagues, {"min_last_changed_date": test_date}),
+    (crud.get_league_standings, {"league_id": 5002}),
+    (crud.get_league_standings_validator, {"league_id": 5002}),
+    (crud.get_teams, {"team_name": "Roaring Kitties"}),
+    (crud.get_teams, {"league_id": 5001}),
+    (crud.get_teams, {"min_last_changed_date": test_date}),
+    (crud.get_player_validator, {"player_id": 1001}),
+    (crud.get_players_by_ids, {"player_ids": [1001, 2009]}),
+    (crud.get_players_by_ids_validator, {}),
+    (crud.get_players_validator, {}),
+    (crud.get_performances_validator, {}),
+    (crud.get_league_validator, {"league_id": 5002}),
+    (crud.get_leagues_validator, {}),
+    (crud.get_teams_validator, {}),
+    (crud.get_counts_validator, {}),
+    (crud.get_leaderboard, {"min_week": 202301, "max_week": 202310}),
+    (crud.get_leaderboard_validator, {}),
+])
+def test_query_plan_uses_indexes(db_session, capture_statements, crud_function, 
+                                 kwargs):
+    """Tests that no statement run by a filtered crud function scans a table"""
+    with capture_statements() as statements:
+        crud_function(db_session, **kwargs)
+    connection = db_session.connection()
+    for statement, parameters in statements:
+        plan = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + statement, parameters).all()
+        for row in plan:
+            assert not FULL_SCAN.match(row.detail), (statement, row.detail)
+
+@pytest.mark.parametrize("crud_function,kwargs", [
+    (crud.get_players_validator, {"include_performances": False}),
+    (crud.get_players_validator, {}),
+    (crud.get_performances_validator, {}),
+    (crud.get_leagues_validator, {}),
+    (crud.get_teams_validator, {}),
+    (crud.get_leaderboard_validator, {}),
+    (crud.get_counts_validator, {}),
+])
+def test_list_validators_read_only_table_version(db_session, 
+                                                 capture_statements, 
+                                                 crud_function, kwargs):
+    """Tests that a list validator, such as the one the player search runs 
+    on every keystroke, reads change counters instead of the rows"""
+    with capture_statements() as statements:
+        crud_function(db_session, **kwargs)
+    connection = db_session.connection()
+    for statement, parameters in statements:
+        plan = connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + statement, parameters).all()
+        for row in plan:
+            assert not re.match(
+                r"^(SCAN|SEARCH) (?!table_version\b|CONSTANT ROW)",
+                row.detail), (statement, row.detail)
@@ -1,8 +1,48 @@
+import json
+import pytest
+import shutil
 from fastapi.testclient import TestClient
-from main import app
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import crud
+import database
+import main
+import schemas
+from database import SessionLocal
+from main import app, get_db
+from pydantic import TypeAdapter
 
 client = TestClient(app)
 
+# the most SQL statements any endpoint may run, no matter how many rows
+MAX_STATEMENTS_PER_REQUEST = 3
+
+
+@pytest.fixture
+def database_copy(tmp_path, monkeypatch):
+    """Serves the app from a copy of the database that a test can change"""
+    database_file = tmp_path / "fantasy_data.db"
+    shutil.copy(database.DATABASE_FILE, database_file)
+    copy_engine = create_engine(f"sqlite:///{database_file}")
+    CopySession = sessionmaker(bind=copy_engine)
+
+    def get_copy_db():
+        db = CopySession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_copy_db
+    # streaming endpoints open their own sessions
+    monkeypatch.setattr(main, "SessionLocal", CopySession)
+    # the copy starts with the same change counters as the bundled database
+    monkeypatch.setitem(crud._counts_cache, "version", None)
+    yield copy_engine
+    app.dependency_overrides.clear()
+    copy_engine.dispose()
+
 
 # test the health check endpoint
 def test_read_main():
@@ -25,6 +65,20 @@ def test_read_players_by_name():
     assert response.json()[0].get("player_id") == 2009
 
 
+def test_read_players_lean_by_default():
+    response = client.get("/v0/players/?first_name=Bryce&last_name=Young")
+    assert response.status_code == 200
+    assert "performances" not in response.json()[0]
+
+
+def test_read_players_include_performances():
+    response = client.get(
+        "/v0/players/?first_name=Bryce&last_name=Young&include=performances"
+    )
+    assert response.status_code == 200
+    assert len(response.json()[0]["performances"]) > 0
+
+
 # test /v0/players/{player_id}/
 def test_read_players_with_id():
     response = client.get("/v0/players/1001/")
@@ -48,6 +102,226 @@ def test_read_performances_by_date():
     assert len(response.json()) == 2711
 
 
+# test /v0/performances/ with cursor pagination
+def test_read_performances_by_cursor():
+    pages = []
+    response = client.get("/v0/performances/?limit=5000")
+    while True:
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        response = client.get(f"/v0/performances/?limit=5000&cursor={cursor}")
+    performance_ids = [p["performance_id"] for page in pages for p in page]
+    assert len(performance_ids) == 17306
+    assert len(set(performance_ids)) == 17306
+
+
+def test_read_players_bad_cursor():
+    response = client.get("/v0/players/?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+
+# test player search
+def test_search_players():
+    response = client.get("/v0/players/search?q=josh&limit=5")
+    assert response.status_code == 200
+    players = response.json()
+    assert 0 < len(players) <= 5
+    assert all(player["first_name"].startswith("Josh") for player in players)
+    assert "performances" not in players[0]
+
+
+def test_search_players_needs_a_query():
+    response = client.get("/v0/players/search?q=")
+    assert response.status_code == 422
+
+
+# test the player batch endpoint
+def test_read_players_batch():
+    response = client.get("/v0/players/batch?ids=1002,1001&ids=99999&ids=1002")
+    assert response.status_code == 200
+    players = response.json()["players"]
+    assert [player["player_id"] for player in players] == [1002, 1001, 99999]
+    assert [player["found"] for player in players] == [True, True, False]
+    assert players[1]["player"] == client.get("/v0/players/1001/").json()
+    assert players[2]["player"] is None
+
+
+def test_read_players_batch_post():
+    response = client.post("/v0/players/batch", json={"ids": [2009, 99999]})
+    assert response.status_code == 200
+    players = response.json()["players"]
+    assert players[0]["player"]["last_name"] == "Young"
+    assert players[1] == {"player_id": 99999, "found": False, "player": None}
+
+
+@pytest.mark.parametrize(
+    "ids", ["not-an-id", ",".join(str(player_id) for player_id in range(1001))]
+)
+def test_read_players_batch_bad_ids(ids):
+    response = client.get(f"/v0/players/batch?ids={ids}")
+    assert response.status_code == 400
+
+
+# test the leaderboard
+def test_read_leaderboard():
+    response = client.get(
+        "/v0/leaderboard/?min_week=202301&max_week=202310&position=QB&limit=10"
+    )
+    assert response.status_code == 200
+    leaders = response.json()
+    assert len(leaders) == 10
+    assert all(leader["position"] == "QB" for leader in leaders)
+    points = [leader["fantasy_points"] for leader in leaders]
+    assert points == sorted(points, reverse=True)
+    assert "ETag" in response.headers
+
+
+def test_read_performances_for_week_range():
+    response = client.get(
+        "/v0/performances/?min_week=202316&max_week=202317&limit=5000"
+    )
+    assert response.status_code == 200
+    performances = response.json()
+    assert len(performances) == 2036
+    assert {p["week_number"] for p in performances} == {"202316", "202317"}
+
+
+# test league standings
+def test_read_league_standings():
+    response = client.get("/v0/leagues/5002/standings")
+    assert response.status_code == 200
+    standings = response.json()
+    assert len(standings) == 8
+    points = [standing["fantasy_points"] for standing in standings]
+    assert points == sorted(points, reverse=True)
+    assert standings[0]["weeks"][0]["week_number"] == "202301"
+    etag = response.headers["ETag"]
+    response = client.get("/v0/leagues/5002/standings", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_read_league_standings_not_found():
+    response = client.get("/v0/leagues/1/standings")
+    assert response.status_code == 404
+
+
+# test streaming NDJSON
+def test_read_performances_ndjson():
+    response = client.get("/v0/performances/?skip=0&limit=20000&format=ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert len(lines) == 17306
+    assert json.loads(lines[0]) == client.get("/v0/performances/?limit=1").json()[0]
+
+
+def test_read_players_ndjson_accept_header():
+    response = client.get(
+        "/v0/players/?first_name=Bryce&last_name=Young&include=performances",
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    players = [json.loads(line) for line in response.text.splitlines()]
+    assert len(players) == 1
+    assert players[0]["player_id"] == 2009
+    assert len(players[0]["performances"]) > 0
+
+
+def test_read_teams_ndjson():
+    response = client.get("/v0/teams/?league_id=5001&format=ndjson")
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 12
+    assert "ETag" in response.headers
+
+
+def test_read_players_ndjson_bad_cursor():
+    response = client.get("/v0/players/?format=ndjson&cursor=not-a-cursor")
+    assert response.status_code == 400
+
+
+# test the delta sync endpoint
+def test_read_changes():
+    response = client.get("/v0/changes/?since=2024-05-01")
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records[-1] == {"watermark": "2024-05-30"}
+    assert response.headers["X-Watermark"] == "2024-05-30"
+    changes = records[:-1]
+    assert {change["table"] for change in changes} == {"performance"}
+    assert all(change["row"]["last_changed_date"] >= "2024-05-01" for change in changes)
+
+
+def test_read_all_changes():
+    response = client.get("/v0/changes/")
+    tables = [json.loads(line).get("table") for line in response.text.splitlines()]
+    assert tables.count("league") == 5
+    assert tables.count("team_player") == 140
+    assert tables.count("performance") == 17306
+    assert tables.index("league") < tables.index("team") < tables.index("player")
+
+
+def test_read_changes_reports_deletes(database_copy):
+    response = client.get("/v0/changes/?since=2024-06-01")
+    watermark = json.loads(response.text.splitlines()[-1])["watermark"]
+    with database_copy.begin() as connection:
+        team_id, player_id = connection.execute(
+            text("SELECT team_id, player_id FROM team_player LIMIT 1")
+        ).one()
+        connection.execute(
+            text(
+                "DELETE FROM team_player WHERE team_id = :team AND player_id = :player"
+            ),
+            {"team": team_id, "player": player_id},
+        )
+    response = client.get(f"/v0/changes/?since={watermark}")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert {
+        "table": "team_player",
+        "deleted": {"team_id": team_id, "player_id": player_id},
+    } in records
+    assert records[-1]["watermark"] > watermark
+
+
+def test_read_changes_after_watermark():
+    response = client.get("/v0/changes/?since=2024-06-01")
+    assert response.text.splitlines() == ['{"watermark":"2024-06-01"}']
+
+
+# test that the fast serialization path matches the response models
+@pytest.mark.parametrize(
+    "url,crud_function,schema",
+    [
+        ("/v0/players/?limit=10000", crud.get_players, schemas.PlayerBase),
+        (
+            "/v0/players/?limit=10000&include=performances",
+            crud.get_players,
+            schemas.Player,
+        ),
+        ("/v0/performances/?limit=20000", crud.get_performances, schemas.Performance),
+        ("/v0/leagues/", crud.get_leagues, schemas.LeagueBase),
+        ("/v0/leagues/?include=teams", crud.get_leagues, schemas.League),
+        ("/v0/teams/", crud.get_teams, schemas.TeamBase),
+        ("/v0/teams/?include=players", crud.get_teams, schemas.Team),
+    ],
+)
+def test_fast_serialization_matches_schema(url, crud_function, schema):
+    db = SessionLocal()
+    try:
+        rows = crud_function(db, limit=20000)
+        adapter = TypeAdapter(list[schema])
+        expected = adapter.dump_python(
+            adapter.validate_python(rows, from_attributes=True), mode="json"
+        )
+    finally:
+        db.close()
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.json() == expected
+
+
 # test /v0/leagues/{league_id}/
 def test_read_leagues_with_id():
     response = client.get("/v0/leagues/5002/")
@@ -69,6 +343,24 @@ def test_read_teams():
     assert len(response.json()) == 20
 
 
+def test_read_leagues_include_teams():
+    response = client.get("/v0/leagues/?skip=0&limit=500&include=teams")
+    assert response.status_code == 200
+    assert sum(len(league["teams"]) for league in response.json()) == 20
+
+
+# test /v0/teams/
+def test_read_teams_include_players():
+    response = client.get("/v0/teams/?skip=0&limit=500&include=players")
+    assert response.status_code == 200
+    assert all("players" in team for team in response.json())
+
+
+def test_read_teams_bad_include():
+    response = client.get("/v0/teams/?include=leagues")
+    assert response.status_code == 422
+
+
 # test /v0/teams/
 def test_read_teams_for_one_league():
     response = client.get("/v0/teams/?skip=0&limit=500&league_id=5001")
@@ -84,3 +376,186 @@ def test_counts():
     assert response_data["league_count"] == 5
     assert response_data["team_count"] == 20
     assert response_data["player_count"] == 1018
+    assert response_data["performance_count"] == 17306
+
+
+def test_counts_with_empty_table(database_copy):
+    with database_copy.begin() as connection:
+        connection.execute(text("DELETE FROM team_player"))
+        connection.execute(text("DELETE FROM team"))
+        connection.execute(text("DELETE FROM league"))
+    response = client.get("/v0/counts/")
+    assert response.status_code == 200
+    assert response.json()["league_count"] == 0
+    assert response.json()["team_count"] == 0
+
+
+def test_counts_change_after_delete(database_copy):
+    response = client.get("/v0/counts/")
+    etag = response.headers["ETag"]
+    with database_copy.begin() as connection:
+        connection.execute(text("DELETE FROM performance WHERE performance_id = 2501"))
+    response = client.get("/v0/counts/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["performance_count"] == 17305
+
+
+# test conditional requests
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/v0/players/?skip=0&limit=100",
+        "/v0/players/1001/",
+        "/v0/players/search?q=jos",
+        "/v0/players/batch?ids="
+        + ",".join(str(player_id) for player_id in range(1001, 1201)),
+        "/v0/performances/?skip=0&limit=100",
+        "/v0/leagues/?include=teams",
+        "/v0/leagues/5002/",
+        "/v0/leagues/5002/standings",
+        "/v0/teams/?league_id=5001",
+        "/v0/counts/",
+        "/v0/leaderboard/?min_week=202301&max_week=202310",
+    ],
+)
+def test_if_none_match(url):
+    response = client.get(url)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+
+def test_if_none_match_changed():
+    response = client.get(
+        "/v0/players/?skip=0&limit=100", headers={"If-None-Match": 'W/"stale"'}
+    )
+    assert response.status_code == 200
+    assert len(response.json()) == 100
+
+
+def test_etag_depends_on_parameters():
+    first_page = client.get("/v0/players/?skip=0&limit=100")
+    second_page = client.get(
+        "/v0/players/?skip=100&limit=100",
+        headers={"If-None-Match": first_page.headers["ETag"]},
+    )
+    assert second_page.status_code == 200
+
+
+def test_if_modified_since():
+    response = client.get("/v0/leagues/")
+    last_modified = response.headers["Last-Modified"]
+    response = client.get("/v0/leagues/", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+    response = client.get(
+        "/v0/leagues/", headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+    )
+    assert response.status_code == 304
+    response = client.get(
+        "/v0/leagues/", headers={"If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("url", ["/v0/players/99999", "/v0/leagues/99999"])
+def test_if_none_match_star_on_missing_id(url):
+    response = client.get(url, headers={"If-None-Match": "*"})
+    assert response.status_code == 404
+
+
+def test_no_last_modified_in_the_second_of_a_change(database_copy):
+    # a change later in the same second would have the same Last-Modified
+    with database_copy.begin() as connection:
+        connection.execute(
+            text(
+                "UPDATE league SET league_name = 'Renamed League' "
+                "WHERE league_id = 5002"
+            )
+        )
+        connection.execute(
+            text(
+                "UPDATE table_version SET changed_at = changed_at + 60 "
+                "WHERE table_name = 'league'"
+            )
+        )
+    response = client.get("/v0/leagues/5002/")
+    assert "Last-Modified" not in response.headers
+    assert "ETag" in response.headers
+    response = client.get(
+        "/v0/leagues/5002/",
+        headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"},
+    )
+    assert response.status_code == 200
+
+
+def test_etag_changes_on_same_day_update(database_copy):
+    response = client.get("/v0/leagues/5002/")
+    etag = response.headers["ETag"]
+    with database_copy.begin() as connection:
+        connection.execute(
+            text(
+                "UPDATE league SET league_name = 'Renamed League' "
+                "WHERE league_id = 5002"
+            )
+        )
+    response = client.get("/v0/leagues/5002/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["league_name"] == "Renamed League"
+
+
+# test that list endpoints don't lazy load one row at a time
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/v0/players/?skip=0&limit=10000",
+        "/v0/players/?skip=0&limit=10000&include=performances",
+        "/v0/players/1001/",
+        "/v0/players/search?q=jos",
+        "/v0/players/batch?ids="
+        + ",".join(str(player_id) for player_id in range(1001, 1201)),
+        "/v0/performances/?skip=0&limit=20000",
+        "/v0/leagues/?skip=0&limit=500",
+        "/v0/leagues/?skip=0&limit=500&include=teams",
+        "/v0/leagues/5002/",
+        "/v0/leagues/5002/standings",
+        "/v0/teams/?skip=0&limit=500",
+        "/v0/teams/?skip=0&limit=500&include=players",
+        "/v0/counts/",
+        "/v0/leaderboard/?min_week=202301&max_week=202310",
+    ],
+)
+def test_statement_count(url, capture_statements):
+    with capture_statements() as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(statements) <= MAX_STATEMENTS_PER_REQUEST
+
+
+# test that the async database path returns the same data as the sync path
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/v0/players/?skip=0&limit=10000&include=performances",
+        "/v0/players/1001/",
+        "/v0/players/search?q=jos",
+        "/v0/players/batch?ids="
+        + ",".join(str(player_id) for player_id in range(1001, 1201)),
+        "/v0/performances/?skip=0&limit=20000&minimum_last_changed_date=2024-04-01",
+        "/v0/leagues/?include=teams",
+        "/v0/leagues/5002/",
+        "/v0/leagues/5002/standings",
+        "/v0/teams/?include=players",
+        "/v0/counts/",
+        "/v0/leaderboard/?min_week=202301&max_week=202310",
+    ],
+)
+def test_async_database_path(url, monkeypatch):
+    sync_response = client.get(url)
+    monkeypatch.setattr(database, "USE_ASYNC_DB", True)
+    async_response = client.get(url)
+    assert async_response.status_code == 200
+    assert async_response.json() == sync_response.json()
+    assert async_response.headers["ETag"] == sync_response.headers["ETag"]
@@ -0,0 +1,67 @@
+"""Benchmark of SDK calls with and without a pooled connection.
+
+Calls the same endpoints against a running SWC API two ways: with a new
+httpx.Client for every call, as call_api used to, and with one SWCClient,
+which keeps its connections open between calls. Prints the latency of
+each call both ways.
+
+Typical usage example:
+
+    python benchmarks/bench_connections.py --base-url http://0.0.0.0:8000 \
+        --calls 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from swcpy import SWCClient, SWCConfig
+
+ENDPOINTS = [
+    SWCClient.HEALTH_CHECK_ENDPOINT,
+    f"{SWCClient.LIST_LEAGUES_ENDPOINT}5001",
+    SWCClient.GET_COUNTS_ENDPOINT,
+]
+
+
+def time_calls(call, endpoint: str, calls: int) -> list[float]:
+    """Returns the milliseconds each call took, after one warm-up call"""
+    call(endpoint)
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call(endpoint).raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default=os.getenv("SWC_API_BASE_URL"))
+    parser.add_argument("--calls", type=int, default=500,
+                        help="Calls to make to each endpoint, each way")
+    args = parser.parse_args()
+
+    config = SWCConfig(swc_base_url=args.base_url, backoff=False)
+
+    def new_connection(endpoint: str) -> httpx.Response:
+        with httpx.Client(base_url=config.swc_base_url) as client:
+            return client.get(endpoint)
+
+    with SWCClient(config) as client:
+        for endpoint in ENDPOINTS:
+            for label, call in [("new connection", new_connection),
+                                ("pooled", client.call_api)]:
+                latencies = time_calls(call, endpoint, args.calls)
+                print(f"{endpoint:>18} {label:>15}: "
+                      f"mean {statistics.mean(latencies):6.2f} ms  "
+                      f"p50 {statistics.median(latencies):6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,3 @@
 from .swc_client import SWCClient
+from .swc_async_client import AsyncSWCClient
 from .swc_config import SWCConfig
\ No newline at end of file
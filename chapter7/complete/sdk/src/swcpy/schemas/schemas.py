@@ -1,6 +1,6 @@
 """Pydantic schemas"""
 from pydantic import BaseModel, ConfigDict
-from typing import List
+from typing import List, Optional
 from datetime import date
 
 
@@ -52,3 +52,4 @@ class Counts(BaseModel):
     league_count : int
     team_count : int
     player_count : int
+    performance_count : Optional[int] = None
@@ -0,0 +1,462 @@
+import asyncio
+import httpx
+import swcpy.swc_config as config
+from .schemas import League, Team, Player, Performance, Counts
+from .swc_cache import ResponseCache
+from .swc_client import SWCClient, bulk_file_names, http_client_args, is_permanent_error
+from typing import AsyncIterator, List
+import backoff
+import logging
+logger = logging.getLogger(__name__)
+
+class AsyncSWCClient:
+    """Interacts with the Sports World Central API from asyncio code.
+
+        Has the same methods as SWCClient, as coroutines. They don't
+        block the event loop, so one process can have many calls in
+        flight at once. The calls share a pool of HTTP connections, so
+        close the client when you are done, or use it as an async
+        context manager.
+
+    Typical usage example:
+
+        async with AsyncSWCClient(SWCConfig()) as client:
+            leagues, counts = await asyncio.gather(
+                client.list_leagues(), client.get_counts()
+            )
+
+    """
+
+    HEALTH_CHECK_ENDPOINT = SWCClient.HEALTH_CHECK_ENDPOINT
+    LIST_LEAGUES_ENDPOINT = SWCClient.LIST_LEAGUES_ENDPOINT
+    LIST_PLAYERS_ENDPOINT = SWCClient.LIST_PLAYERS_ENDPOINT
+    LIST_PERFORMANCES_ENDPOINT = SWCClient.LIST_PERFORMANCES_ENDPOINT
+    LIST_TEAMS_ENDPOINT = SWCClient.LIST_TEAMS_ENDPOINT
+    GET_COUNTS_ENDPOINT = SWCClient.GET_COUNTS_ENDPOINT
+    FETCH_ALL_RESOURCES = SWCClient.FETCH_ALL_RESOURCES
+
+    BULK_FILE_BASE_URL = SWCClient.BULK_FILE_BASE_URL
+
+    def __init__(self, input_config: config.SWCConfig):
+        """Class constructor that sets varibles from configuration object."""
+
+        logger.debug(f"Input config: {input_config}")
+
+        self.swc_base_url = input_config.swc_base_url
+        self.backoff = input_config.swc_backoff
+        self.backoff_max_time = input_config.swc_backoff_max_time
+        self.bulk_file_format = input_config.swc_bulk_file_format
+
+        self.http_client = httpx.AsyncClient(**http_client_args(input_config))
+        self.response_cache = None
+        if input_config.swc_cache_dir:
+            self.response_cache = ResponseCache(
+                input_config.swc_cache_dir, input_config.swc_cache_max_bytes
+            )
+
+        if self.backoff:
+            self.call_api = backoff.on_exception(
+                wait_gen=backoff.expo,
+                exception=(httpx.RequestError, httpx.HTTPStatusError),
+                max_time=self.backoff_max_time,
+                jitter=backoff.random_jitter,
+                giveup=is_permanent_error,
+            )(self.call_api)
+
+        self.BULK_FILE_NAMES = bulk_file_names(self.bulk_file_format)
+
+    async def aclose(self):
+        """Closes the connections in the client's pool and the cache."""
+        await self.http_client.aclose()
+        if self.response_cache:
+            self.response_cache.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def _get(self, api_endpoint: str, api_params: dict = None) -> httpx.Response:
+        """Sends a GET request, revalidating the cached response if there is one.
+
+        The cache file is read and written in a worker thread, so the
+        event loop isn't blocked on the disk.
+        """
+        if self.response_cache is None:
+            return await self.http_client.get(api_endpoint, params=api_params)
+        key = ResponseCache.make_key(self.swc_base_url + api_endpoint, api_params)
+        cached = await asyncio.to_thread(self.response_cache.get, key)
+        headers = ResponseCache.validator_headers(cached) if cached else None
+        response = await self.http_client.get(api_endpoint, params=api_params, headers=headers)
+        return await asyncio.to_thread(
+            self.response_cache.handle_response, key, cached, response
+        )
+
+    async def call_api(self,
+                api_endpoint: str,
+                api_params: dict = None
+            ) -> httpx.Response:
+            """Makes API call and logs errors."""
+
+            if api_params:
+                api_params = {key: val for key, val in api_params.items() if val is not None}
+
+            try:
+                logger.debug(f"base_url: {self.swc_base_url}, api_endpoint: {api_endpoint}, api_params: {api_params}")
+                response = await self._get(api_endpoint, api_params)
+                if response.is_error:
+                    response.raise_for_status()
+                logger.debug(f"Response status: {response.status_code}, length: {len(response.content)} bytes")
+                return response
+            except httpx.HTTPStatusError as e:
+                logger.error(
+                    f"HTTP status error occurred: {e.response.status_code} {e.response.text}"
+                )
+                raise
+            except httpx.RequestError as e:
+                logger.error(f"Request error occurred: {str(e)}")
+                raise
+
+    async def get_health_check(self) -> httpx.Response:
+        """Checks if API is running and healthy.
+
+        Returns:
+            An httpx.Response object from the API health check endpoint.
+
+        """
+        logger.debug("Entered health check")
+        return await self.call_api(self.HEALTH_CHECK_ENDPOINT)
+
+    async def list_leagues(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        minimum_last_changed_date: str = None,
+        league_name: str = None,
+        include: str = None,
+    ) -> List[League]:
+        """Returns a List of Leagues filtered by parameters.
+
+        Returns:
+        A List of schemas.League objects from the API v0/leagues endpoint.
+
+        """
+        logger.debug("Entered list leagues")
+
+        params = {
+            "skip": skip,
+            "limit": limit,
+            "minimum_last_changed_date": minimum_last_changed_date,
+            "league_name": league_name,
+            "include": include,
+        }
+
+        response = await self.call_api(self.LIST_LEAGUES_ENDPOINT, params)
+        return [League(**league) for league in response.json()]
+
+    async def get_league_by_id(self, league_id: int) -> League:
+        """Returns a Leagues matching a league_id.
+
+        Returns:
+        A schemas.League object from the API v0/leagues/{league_id} endpoint.
+
+        """
+        logger.debug("Entered get league by ID")
+        response = await self.call_api(f"{self.LIST_LEAGUES_ENDPOINT}{league_id}")
+        return League(**response.json())
+
+    async def get_counts(self) -> Counts:
+        """Returns Counts of several endpoints.
+
+        Returns:
+        A Counts object from the API v0/counts endpoint.
+
+        """
+        logger.debug("Entered get counts")
+        response = await self.call_api(self.GET_COUNTS_ENDPOINT)
+        return Counts(**response.json())
+
+    async def list_teams(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        minimum_last_changed_date: str = None,
+        team_name: str = None,
+        league_id: int = None,
+        include: str = None,
+    ) -> List[Team]:
+        """Returns a List of Teams filtered by parameters.
+
+        Returns:
+        A List of schemas.Team objects from the API v0/teams endpoint.
+
+        """
+        logger.debug("Entered list teams")
+
+        params = {
+            "skip": skip,
+            "limit": limit,
+            "minimum_last_changed_date": minimum_last_changed_date,
+            "team_name": team_name,
+            "league_id": league_id,
+            "include": include,
+        }
+        response = await self.call_api(self.LIST_TEAMS_ENDPOINT, params)
+        return [Team(**team) for team in response.json()]
+
+    async def list_players(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        minimum_last_changed_date: str = None,
+        first_name: str = None,
+        last_name: str = None,
+        include: str = None,
+    ) -> List[Player]:
+        """Returns a List of Players filtered by parameters.
+
+        Returns:
+        A List of schemas.Player objects from the API v0/players endpoint.
+
+        """
+        logger.debug("Entered list players")
+
+        params = {
+            "skip": skip,
+            "limit": limit,
+            "minimum_last_changed_date": minimum_last_changed_date,
+            "first_name": first_name,
+            "last_name": last_name,
+            "include": include,
+        }
+
+        response = await self.call_api(self.LIST_PLAYERS_ENDPOINT, params)
+        return [Player(**player) for player in response.json()]
+
+    async def get_player_by_id(self, player_id: int) -> Player:
+        """Returns a Players matching the SWC Player ID.
+
+        Returns:
+        A schemas.Player object from the API v0/players/{player_id} endpoint.
+
+        """
+        logger.debug("Entered get player by ID")
+        response = await self.call_api(f"{self.LIST_PLAYERS_ENDPOINT}{player_id}")
+        return Player(**response.json())
+
+    async def list_performances(
+        self, skip: int = 0, limit: int = 100, minimum_last_changed_date: str = None
+    ) -> List[Performance]:
+        """Returns a List of Performances filtered by parameters.
+
+        Returns:
+        A List of schemas.Performance objects from the API v0/performances
+        endpoint.
+
+        """
+        logger.debug("Entered get performances")
+
+        params = {
+            "skip": skip,
+            "limit": limit,
+            "minimum_last_changed_date": minimum_last_changed_date,
+        }
+
+        response = await self.call_api(self.LIST_PERFORMANCES_ENDPOINT, params)
+        return [Performance(**performance) for performance in response.json()]
+
+#paginating iterators
+
+    async def _fetch_page(self, api_endpoint: str, api_params: dict, model) -> tuple:
+        """Returns one page of model objects and the cursor of the next page."""
+        response = await self.call_api(api_endpoint, api_params)
+        return (
+            [model(**item) for item in response.json()],
+            response.headers.get("X-Next-Cursor"),
+        )
+
+    async def _iter_pages(
+        self, api_endpoint: str, model, api_params: dict, page_size: int, skip: int = 0
+    ) -> AsyncIterator[list]:
+        """Yields the pages of a list endpoint until a short page.
+
+        The next page is fetched in a background task while the caller
+        works on the current one. Endpoints that return an X-Next-Cursor
+        header are paged with the cursor, and the others with skip.
+        """
+        SWCClient._check_page_size(page_size)
+        params = dict(api_params, skip=skip, limit=page_size)
+        next_page = asyncio.create_task(self._fetch_page(api_endpoint, dict(params), model))
+        try:
+            while next_page:
+                page, cursor = await next_page
+                next_page = None
+                if len(page) == page_size:
+                    if cursor:
+                        params["cursor"] = cursor
+                    else:
+                        params["skip"] += page_size
+                    next_page = asyncio.create_task(
+                        self._fetch_page(api_endpoint, dict(params), model)
+                    )
+                yield page
+        finally:
+            if next_page:
+                next_page.cancel()
+
+    async def iter_leagues(
+        self,
+        page_size: int = 100,
+        minimum_last_changed_date: str = None,
+        league_name: str = None,
+        include: str = None,
+    ) -> AsyncIterator[League]:
+        """Yields every League that matches the parameters, page by page."""
+        logger.debug("Entered iter leagues")
+        params = {
+            "minimum_last_changed_date": minimum_last_changed_date,
+            "league_name": league_name,
+            "include": include,
+        }
+        async for page in self._iter_pages(self.LIST_LEAGUES_ENDPOINT, League, params, page_size):
+            for item in page:
+                yield item
+
+    async def iter_teams(
+        self,
+        page_size: int = 100,
+        minimum_last_changed_date: str = None,
+        team_name: str = None,
+        league_id: int = None,
+        include: str = None,
+    ) -> AsyncIterator[Team]:
+        """Yields every Team that matches the parameters, page by page."""
+        logger.debug("Entered iter teams")
+        params = {
+            "minimum_last_changed_date": minimum_last_changed_date,
+            "team_name": team_name,
+            "league_id": league_id,
+            "include": include,
+        }
+        async for page in self._iter_pages(self.LIST_TEAMS_ENDPOINT, Team, params, page_size):
+            for item in page:
+                yield item
+
+    async def iter_players(
+        self,
+        page_size: int = 100,
+        minimum_last_changed_date: str = None,
+        first_name: str = None,
+        last_name: str = None,
+        include: str = None,
+    ) -> AsyncIterator[Player]:
+        """Yields every Player that matches the parameters, page by page."""
+        logger.debug("Entered iter players")
+        params = {
+            "minimum_last_changed_date": minimum_last_changed_date,
+            "first_name": first_name,
+            "last_name": last_name,
+            "include": include,
+        }
+        async for page in self._iter_pages(self.LIST_PLAYERS_ENDPOINT, Player, params, page_size):
+            for item in page:
+                yield item
+
+    async def iter_performances(
+        self, page_size: int = 100, minimum_last_changed_date: str = None
+    ) -> AsyncIterator[Performance]:
+        """Yields every Performance that matches the parameters, page by page."""
+        logger.debug("Entered iter performances")
+        params = {"minimum_last_changed_date": minimum_last_changed_date}
+        async for page in self._iter_pages(
+            self.LIST_PERFORMANCES_ENDPOINT, Performance, params, page_size
+        ):
+            for item in page:
+                yield item
+
+    async def fetch_all(
+        self,
+        resource: str,
+        page_size: int = 1000,
+        max_concurrency: int = 4,
+        include: str = None,
+    ) -> list:
+        """Returns every record of a resource, fetching pages concurrently.
+
+        Sizes the job with get_counts, requests up to max_concurrency pages
+        at once and returns the records in page order. Pages that fail
+        with a 429 or 5xx status are retried with backoff. Records added
+        after the count are picked up by paging on from the last page.
+
+        Args:
+        resource:
+            One of leagues, teams, players or performances.
+        page_size:
+            The number of records to request in each call, at least 1.
+        max_concurrency:
+            The max number of calls in flight at once.
+        include (optional):
+            The nested list to include with each record: teams for
+            leagues, players for teams or performances for players.
+
+        Returns:
+        A List of the schemas objects of the resource.
+
+        """
+        logger.debug("Entered fetch all")
+        api_endpoint, model, count_field = SWCClient._fetch_all_resource(resource)
+        SWCClient._check_page_size(page_size)
+        page_count = SWCClient._page_count(await self.get_counts(), count_field, page_size)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch_page(page_number: int) -> list:
+            params = {"skip": page_number * page_size, "limit": page_size, "include": include}
+            async with semaphore:
+                return (await self._fetch_page(api_endpoint, params, model))[0]
+
+        pages = await asyncio.gather(*[fetch_page(n) for n in range(page_count)])
+        if len(pages[-1]) == page_size:
+            async for page in self._iter_pages(
+                api_endpoint, model, {"include": include}, page_size, page_count * page_size
+            ):
+                pages.append(page)
+        return [record for page in pages for record in page]
+
+#bulk endpoints
+
+    async def get_bulk_file(self, bulk_file_name: str) -> bytes:
+        """Returns the contents of one bulk file"""
+
+        file_path = self.BULK_FILE_BASE_URL + bulk_file_name
+
+        response = await self.http_client.get(file_path, follow_redirects=True)
+
+        if response.status_code == 200:
+            logger.debug("File downloaded successfully")
+            return response.content
+
+    async def get_bulk_player_file(self) -> bytes:
+        """Returns a bulk file with player data"""
+        logger.debug("Entered get bulk player file")
+        return await self.get_bulk_file(self.BULK_FILE_NAMES["players"])
+
+    async def get_bulk_league_file(self) -> bytes:
+        """Returns a bulk file with league data"""
+        logger.debug("Entered get bulk league file")
+        return await self.get_bulk_file(self.BULK_FILE_NAMES["leagues"])
+
+    async def get_bulk_performance_file(self) -> bytes:
+        """Returns a bulk file with performance data"""
+        logger.debug("Entered get bulk performance file")
+        return await self.get_bulk_file(self.BULK_FILE_NAMES["performances"])
+
+    async def get_bulk_team_file(self) -> bytes:
+        """Returns a bulk file with team data"""
+        logger.debug("Entered get bulk team file")
+        return await self.get_bulk_file(self.BULK_FILE_NAMES["teams"])
+
+    async def get_bulk_team_player_file(self) -> bytes:
+        """Returns a bulk file with team player data"""
+        logger.debug("Entered get bulk team player file")
+        return await self.get_bulk_file(self.BULK_FILE_NAMES["team_players"])
@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+import httpx
+import logging
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """Stores API responses on disk so they can be revalidated later.
+
+        Responses that came with an ETag or Last-Modified header are
+        saved in a SQLite file in the cache directory, keyed by the URL
+        and the sorted query parameters. The next call for the same key
+        sends those validators back, and a 304 Not Modified response is
+        answered with the saved body. The file is kept under max_bytes
+        by removing the least recently used responses.
+
+        The cache file can be shared by several clients and processes.
+
+    Typical usage example:
+
+        config = SWCConfig(cache_dir=".swc_cache")
+        client = SWCClient(config)
+
+    """
+
+    CACHE_FILE_NAME = "responses.db"
+
+    # headers that describe the encoded body instead of the saved one
+    SKIPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+    def __init__(self, cache_dir: str, max_bytes: int = 100 * 1024 * 1024):
+        """Class constructor that opens or creates the cache file."""
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            os.path.join(cache_dir, self.CACHE_FILE_NAME),
+            timeout=30,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS response ("
+            "key TEXT PRIMARY KEY, headers TEXT NOT NULL, body BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def make_key(url: str, params: dict = None) -> str:
+        """Returns the cache key of a URL and its query parameters."""
+        if not params:
+            return url
+        return url + "?" + urlencode(sorted((key, str(val)) for key, val in params.items()))
+
+    def get(self, key: str) -> httpx.Response:
+        """Returns the saved response for a key, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT headers, body FROM response WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                "UPDATE response SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+        headers, body = row
+        return httpx.Response(200, headers=json.loads(headers), content=body)
+
+    def set(self, key: str, response: httpx.Response):
+        """Saves a response, then removes the least recently used
+        responses until the cache fits in max_bytes."""
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+        headers = json.dumps([
+            (name, value) for name, value in response.headers.multi_items()
+            if name.lower() not in self.SKIPPED_HEADERS
+        ])
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?)",
+                    (key, headers, body, len(body), time.time()),
+                )
+                self._connection.execute(
+                    "DELETE FROM response WHERE key IN (SELECT key FROM ("
+                    "SELECT key, SUM(size) OVER (ORDER BY last_used DESC, key) AS total "
+                    "FROM response) WHERE total > ?)",
+                    (self.max_bytes,),
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def clear(self):
+        """Removes every saved response."""
+        with self._lock:
+            self._connection.execute("DELETE FROM response")
+
+    def close(self):
+        """Closes the cache file."""
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def validator_headers(cached: httpx.Response) -> dict:
+        """Returns the conditional request headers for a saved response."""
+        headers = {}
+        if "etag" in cached.headers:
+            headers["If-None-Match"] = cached.headers["etag"]
+        if "last-modified" in cached.headers:
+            headers["If-Modified-Since"] = cached.headers["last-modified"]
+        return headers
+
+    def handle_response(self, key: str, cached: httpx.Response, response: httpx.Response) -> httpx.Response:
+        """Returns the response to give the caller, saving it if it can be
+        revalidated later.
+
+        A 304 Not Modified response is answered with the saved response.
+        """
+        if cached is not None and response.status_code == 304:
+            logger.debug(f"Cached response is current: {key}")
+            self.hits += 1
+            cached.request = response.request
+            return cached
+        self.misses += 1
+        if response.status_code == 200 and (
+            "etag" in response.headers or "last-modified" in response.headers
+        ):
+            self.set(key, response)
+        return response
@@ -1,11 +1,52 @@
 import httpx
 import swcpy.swc_config as config
 from .schemas import League, Team, Player, Performance, Counts
-from typing import List
+from .swc_cache import ResponseCache
+from typing import Iterator, List
+from concurrent.futures import ThreadPoolExecutor
+import math
 import backoff
 import logging
 logger = logging.getLogger(__name__)
 
+
+def http_client_args(input_config: config.SWCConfig) -> dict:
+    """Returns the httpx client arguments for a configuration object."""
+    return {
+        "base_url": input_config.swc_base_url,
+        "timeout": input_config.swc_timeout,
+        "limits": httpx.Limits(
+            max_connections=input_config.swc_max_connections,
+            max_keepalive_connections=input_config.swc_max_keepalive_connections,
+            keepalive_expiry=input_config.swc_keepalive_expiry,
+        ),
+    }
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Returns True for errors that retrying won't fix, such as a 404.
+
+    Request errors, 429 Too Many Requests and 5xx server errors are
+    retried with backoff.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        return status_code != 429 and status_code < 500
+    return False
+
+
+def bulk_file_names(bulk_file_format: str) -> dict:
+    """Returns the bulk file name of each kind of data for a format."""
+    extension = ".parquet" if bulk_file_format.lower() == "parquet" else ".csv"
+    return {
+        "players": "player_data" + extension,
+        "leagues": "league_data" + extension,
+        "performances": "performance_data" + extension,
+        "teams": "team_data" + extension,
+        "team_players": "team_player_data" + extension,
+    }
+
+
 class SWCClient:
     """Interacts with the Sports World Central API.
 
@@ -13,10 +54,13 @@ class SWCClient:
         football API. It supports all the functions of SWC API and returns
         validated datatypes.
 
+        The client keeps a pool of HTTP connections open between calls,
+        so close it when you are done, or use it as a context manager.
+
     Typical usage example:
 
-        client = SWCClient()
-        response = client.get_health_check()
+        with SWCClient(SWCConfig()) as client:
+            response = client.get_health_check()
 
     """
 
@@ -27,6 +71,14 @@ class SWCClient:
     LIST_TEAMS_ENDPOINT = "/v0/teams/"
     GET_COUNTS_ENDPOINT = "/v0/counts/"
 
+    # endpoint, schema and Counts field of each resource for fetch_all
+    FETCH_ALL_RESOURCES = {
+        "leagues": (LIST_LEAGUES_ENDPOINT, League, "league_count"),
+        "teams": (LIST_TEAMS_ENDPOINT, Team, "team_count"),
+        "players": (LIST_PLAYERS_ENDPOINT, Player, "player_count"),
+        "performances": (LIST_PERFORMANCES_ENDPOINT, Performance, "performance_count"),
+    }
+
     BULK_FILE_BASE_URL = (
         "https://raw.githubusercontent.com/[github ID]"
         + "/portfolio-project/main/bulk/"
@@ -46,13 +98,12 @@ class SWCClient:
         self.backoff_max_time = input_config.swc_backoff_max_time
         self.bulk_file_format = input_config.swc_bulk_file_format
 
-        self.BULK_FILE_NAMES = {
-            "players": "player_data",
-            "leagues": "league_data",
-            "performances": "performance_data",
-            "teams": "team_data",
-            "team_players": "team_player_data",
-        }
+        self.http_client = httpx.Client(**http_client_args(input_config))
+        self.response_cache = None
+        if input_config.swc_cache_dir:
+            self.response_cache = ResponseCache(
+                input_config.swc_cache_dir, input_config.swc_cache_max_bytes
+            )
 
         if self.backoff:
             self.call_api = backoff.on_exception(
@@ -60,19 +111,35 @@ class SWCClient:
                 exception=(httpx.RequestError, httpx.HTTPStatusError),
                 max_time=self.backoff_max_time,
                 jitter=backoff.random_jitter,
+                giveup=is_permanent_error,
             )(self.call_api)
 
-        if self.bulk_file_format.lower() == "parquet":
-            self.BULK_FILE_NAMES = {
-                key: value + ".parquet" for key, value in self.BULK_FILE_NAMES.items()
-            }
-        else:
-            self.BULK_FILE_NAMES = {
-                key: value + ".csv" for key, value in self.BULK_FILE_NAMES.items()
-            }
+        self.BULK_FILE_NAMES = bulk_file_names(self.bulk_file_format)
 
         logger.debug(f"Bulk file dictionary: {self.BULK_FILE_NAMES}")
 
+    def close(self):
+        """Closes the connections in the client's pool and the cache."""
+        self.http_client.close()
+        if self.response_cache:
+            self.response_cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get(self, api_endpoint: str, api_params: dict = None) -> httpx.Response:
+        """Sends a GET request, revalidating the cached response if there is one."""
+        if self.response_cache is None:
+            return self.http_client.get(api_endpoint, params=api_params)
+        key = ResponseCache.make_key(self.swc_base_url + api_endpoint, api_params)
+        cached = self.response_cache.get(key)
+        headers = ResponseCache.validator_headers(cached) if cached else None
+        response = self.http_client.get(api_endpoint, params=api_params, headers=headers)
+        return self.response_cache.handle_response(key, cached, response)
+
     def call_api(self,
                 api_endpoint: str,
                 api_params: dict = None
@@ -83,11 +150,12 @@ class SWCClient:
                 api_params = {key: val for key, val in api_params.items() if val is not None}
 
             try:
-                with httpx.Client(base_url=self.swc_base_url) as client: 
-                    logger.debug(f"base_url: {self.swc_base_url}, api_endpoint: {api_endpoint}, api_params: {api_params}")
-                    response = client.get(api_endpoint, params=api_params)
-                    logger.debug(f"Response JSON: {response.json()}")
-                    return response
+                logger.debug(f"base_url: {self.swc_base_url}, api_endpoint: {api_endpoint}, api_params: {api_params}")
+                response = self._get(api_endpoint, api_params)
+                if response.is_error:
+                    response.raise_for_status()
+                logger.debug(f"Response status: {response.status_code}, length: {len(response.content)} bytes")
+                return response
             except httpx.HTTPStatusError as e:
                 logger.error(
                     f"HTTP status error occurred: {e.response.status_code} {e.response.text}"
@@ -120,6 +188,7 @@ class SWCClient:
         limit: int = 100, 
         minimum_last_changed_date: str = None,
         league_name: str = None,
+        include: str = None,
     ) -> List[League]:
         """Returns a List of Leagues filtered by parameters.
 
@@ -138,6 +207,7 @@ class SWCClient:
             "limit": limit,
             "minimum_last_changed_date": minimum_last_changed_date,
             "league_name": league_name,
+            "include": include,
         }
 
         response = self.call_api(self.LIST_LEAGUES_ENDPOINT, params)
@@ -184,6 +254,7 @@ class SWCClient:
         minimum_last_changed_date: str = None,
         team_name: str = None,
         league_id: int = None,
+        include: str = None,
     ):
         """Returns a List of Teams filtered by parameters.
 
@@ -204,6 +275,7 @@ class SWCClient:
             "minimum_last_changed_date": minimum_last_changed_date,
             "team_name": team_name,
             "league_id": league_id,
+            "include": include,
         }
         response = self.call_api(self.LIST_TEAMS_ENDPOINT, params)
         return [Team(**team) for team in response.json()]
@@ -215,6 +287,7 @@ class SWCClient:
         minimum_last_changed_date: str = None,
         first_name: str = None,
         last_name: str = None,
+        include: str = None,
     ):
         """Returns a List of Players filtered by parameters.
 
@@ -234,6 +307,7 @@ class SWCClient:
             "minimum_last_changed_date": minimum_last_changed_date,
             "first_name": first_name,
             "last_name": last_name,
+            "include": include,
         }
 
         response = self.call_api(self.LIST_PLAYERS_ENDPOINT, params)
@@ -283,6 +357,177 @@ class SWCClient:
         response = self.call_api(self.LIST_PERFORMANCES_ENDPOINT, params)
         return [Performance(**peformance) for peformance in response.json()]
 
+#paginating iterators
+
+    def _fetch_page(self, api_endpoint: str, api_params: dict, model) -> tuple:
+        """Returns one page of model objects and the cursor of the next page."""
+        response = self.call_api(api_endpoint, api_params)
+        return (
+            [model(**item) for item in response.json()],
+            response.headers.get("X-Next-Cursor"),
+        )
+
+    def _iter_pages(
+        self, api_endpoint: str, model, api_params: dict, page_size: int, skip: int = 0
+    ) -> Iterator[list]:
+        """Yields the pages of a list endpoint until a short page.
+
+        The next page is fetched in a background thread while the caller
+        works on the current one. Endpoints that return an X-Next-Cursor
+        header are paged with the cursor, and the others with skip.
+        """
+        self._check_page_size(page_size)
+        params = dict(api_params, skip=skip, limit=page_size)
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            next_page = executor.submit(self._fetch_page, api_endpoint, dict(params), model)
+            while next_page:
+                page, cursor = next_page.result()
+                next_page = None
+                if len(page) == page_size:
+                    if cursor:
+                        params["cursor"] = cursor
+                    else:
+                        params["skip"] += page_size
+                    next_page = executor.submit(
+                        self._fetch_page, api_endpoint, dict(params), model
+                    )
+                yield page
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_leagues(
+        self,
+        page_size: int = 100,
+        minimum_last_changed_date: str = None,
+        league_name: str = None,
+        include: str = None,
+    ) -> Iterator[League]:
+        """Yields every League that matches the parameters, page by page."""
+        logger.debug("Entered iter leagues")
+        params = {
+            "minimum_last_changed_date": minimum_last_changed_date,
+            "league_name": league_name,
+            "include": include,
+        }
+        for page in self._iter_pages(self.LIST_LEAGUES_ENDPOINT, League, params, page_size):
+            yield from page
+
+    def iter_teams(
+        self,
+        page_size: int = 100,
+        minimum_last_changed_date: str = None,
+        team_name: str = None,
+        league_id: int = None,
+        include: str = None,
+    ) -> Iterator[Team]:
+        """Yields every Team that matches the parameters, page by page."""
+        logger.debug("Entered iter teams")
+        params = {
+            "minimum_last_changed_date": minimum_last_changed_date,
+            "team_name": team_name,
+            "league_id": league_id,
+            "include": include,
+        }
+        for page in self._iter_pages(self.LIST_TEAMS_ENDPOINT, Team, params, page_size):
+            yield from page
+
+    def iter_players(
+        self,
+        page_size: int = 100,
+        minimum_last_changed_date: str = None,
+        first_name: str = None,
+        last_name: str = None,
+        include: str = None,
+    ) -> Iterator[Player]:
+        """Yields every Player that matches the parameters, page by page."""
+        logger.debug("Entered iter players")
+        params = {
+            "minimum_last_changed_date": minimum_last_changed_date,
+            "first_name": first_name,
+            "last_name": last_name,
+            "include": include,
+        }
+        for page in self._iter_pages(self.LIST_PLAYERS_ENDPOINT, Player, params, page_size):
+            yield from page
+
+    def iter_performances(
+        self, page_size: int = 100, minimum_last_changed_date: str = None
+    ) -> Iterator[Performance]:
+        """Yields every Performance that matches the parameters, page by page."""
+        logger.debug("Entered iter performances")
+        params = {"minimum_last_changed_date": minimum_last_changed_date}
+        for page in self._iter_pages(
+            self.LIST_PERFORMANCES_ENDPOINT, Performance, params, page_size
+        ):
+            yield from page
+
+    def fetch_all(
+        self,
+        resource: str,
+        page_size: int = 1000,
+        max_concurrency: int = 4,
+        include: str = None,
+    ) -> list:
+        """Returns every record of a resource, fetching pages concurrently.
+
+        Sizes the job with get_counts, requests up to max_concurrency pages
+        at once and returns the records in page order. Pages that fail
+        with a 429 or 5xx status are retried with backoff. Records added
+        after the count are picked up by paging on from the last page.
+
+        Args:
+        resource:
+            One of leagues, teams, players or performances.
+        page_size:
+            The number of records to request in each call, at least 1.
+        max_concurrency:
+            The max number of calls in flight at once.
+        include (optional):
+            The nested list to include with each record: teams for
+            leagues, players for teams or performances for players.
+
+        Returns:
+        A List of the schemas objects of the resource.
+
+        """
+        logger.debug("Entered fetch all")
+        api_endpoint, model, count_field = self._fetch_all_resource(resource)
+        self._check_page_size(page_size)
+        page_count = self._page_count(self.get_counts(), count_field, page_size)
+
+        def fetch_page(page_number: int) -> list:
+            params = {"skip": page_number * page_size, "limit": page_size, "include": include}
+            return self._fetch_page(api_endpoint, params, model)[0]
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            pages = list(executor.map(fetch_page, range(page_count)))
+        if len(pages[-1]) == page_size:
+            pages.extend(
+                self._iter_pages(api_endpoint, model, {"include": include}, page_size, page_count * page_size)
+            )
+        return [record for page in pages for record in page]
+
+    @classmethod
+    def _fetch_all_resource(cls, resource: str) -> tuple:
+        if resource not in cls.FETCH_ALL_RESOURCES:
+            raise ValueError(
+                f"resource must be one of {', '.join(cls.FETCH_ALL_RESOURCES)}"
+            )
+        return cls.FETCH_ALL_RESOURCES[resource]
+
+    @staticmethod
+    def _check_page_size(page_size: int):
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+
+    @staticmethod
+    def _page_count(counts: Counts, count_field: str, page_size: int) -> int:
+        count = getattr(counts, count_field)
+        if count is None:
+            raise ValueError(f"The API doesn't return a {count_field}")
+        return max(1, math.ceil(count / page_size))
+
 #bulk endpoints
 
     def get_bulk_player_file(self) -> bytes:
@@ -292,7 +537,7 @@ class SWCClient:
 
         player_file_path = self.BULK_FILE_BASE_URL + self.BULK_FILE_NAMES["players"]
 
-        response = httpx.get(player_file_path, follow_redirects=True)
+        response = self.http_client.get(player_file_path, follow_redirects=True)
 
         if response.status_code == 200:
             logger.debug("File downloaded successfully")
@@ -305,7 +550,7 @@ class SWCClient:
 
         league_file_path = self.BULK_FILE_BASE_URL + self.BULK_FILE_NAMES["leagues"]
 
-        response = httpx.get(league_file_path, follow_redirects=True)
+        response = self.http_client.get(league_file_path, follow_redirects=True)
 
         if response.status_code == 200:
             logger.debug("File downloaded successfully")
@@ -320,7 +565,7 @@ class SWCClient:
             self.BULK_FILE_BASE_URL + self.BULK_FILE_NAMES["performances"]
         )
 
-        response = httpx.get(performance_file_path, follow_redirects=True)
+        response = self.http_client.get(performance_file_path, follow_redirects=True)
 
         if response.status_code == 200:
             logger.debug("File downloaded successfully")
@@ -333,7 +578,7 @@ class SWCClient:
 
         team_file_path = self.BULK_FILE_BASE_URL + self.BULK_FILE_NAMES["teams"]
 
-        response = httpx.get(team_file_path, follow_redirects=True)
+        response = self.http_client.get(team_file_path, follow_redirects=True)
 
         if response.status_code == 200:
             logger.debug("File downloaded successfully")
@@ -348,7 +593,7 @@ class SWCClient:
             self.BULK_FILE_BASE_URL + self.BULK_FILE_NAMES["team_players"]
         )
 
-        response = httpx.get(team_player_file_path, follow_redirects=True)
+        response = self.http_client.get(team_player_file_path, follow_redirects=True)
 
         if response.status_code == 200:
             logger.debug("File downloaded successfully")
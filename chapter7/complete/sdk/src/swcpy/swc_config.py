@@ -6,13 +6,21 @@ load_dotenv()
 class SWCConfig:
     """Configuration class containing arguments for the SDK client.
 
-    Contains configuration for the base URL and progressive backoff.
+    Contains configuration for the base URL, progressive backoff and the
+    pool of HTTP connections the client keeps open, and for the optional
+    cache of responses on disk.
     """
 
     swc_base_url: str
     swc_backoff: bool
     swc_backoff_max_time: int
     swc_bulk_file_format: str
+    swc_timeout: float
+    swc_max_connections: int
+    swc_max_keepalive_connections: int
+    swc_keepalive_expiry: float
+    swc_cache_dir: str
+    swc_cache_max_bytes: int
 
     def __init__(
         self,
@@ -20,6 +28,12 @@ class SWCConfig:
         backoff: bool = True,
         backoff_max_time: int = 30,
         bulk_file_format: str = "csv",
+        timeout: float = 5.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 5.0,
+        cache_dir: str = None,
+        cache_max_bytes: int = 100 * 1024 * 1024,
     ):
         """Constructor for configuration class.
 
@@ -36,6 +50,23 @@ class SWCConfig:
             trying an API call before stopping.
         swc_bulk_file_format:
             If bulk files should be in csv or parquet format.
+        swc_timeout:
+            The number of seconds to wait for a connection, a read
+            or a write before the call fails.
+        swc_max_connections:
+            The max number of connections the client opens at once.
+        swc_max_keepalive_connections:
+            The max number of idle connections kept open for reuse.
+        swc_keepalive_expiry:
+            The number of seconds an idle connection is kept open.
+        swc_cache_dir (optional):
+            A directory to cache responses in, which are then
+            revalidated with the API instead of downloaded again.
+            Pass this in or set in environment variable. No
+            responses are cached without it.
+        swc_cache_max_bytes:
+            The max size of the cached responses, after which the
+            least recently used are removed.
         """
 
         self.swc_base_url = swc_base_url or os.getenv("SWC_API_BASE_URL")
@@ -48,7 +79,13 @@ class SWCConfig:
         self.swc_backoff = backoff
         self.swc_backoff_max_time = backoff_max_time
         self.swc_bulk_file_format = bulk_file_format
+        self.swc_timeout = timeout
+        self.swc_max_connections = max_connections
+        self.swc_max_keepalive_connections = max_keepalive_connections
+        self.swc_keepalive_expiry = keepalive_expiry
+        self.swc_cache_dir = cache_dir or os.getenv("SWC_CACHE_DIR")
+        self.swc_cache_max_bytes = cache_max_bytes
 
     def __str__(self):
         """Stringify function to return contents of config object for logging"""
-        return f"{self.swc_base_url} {self.swc_backoff} {self.swc_backoff_max_time}  {self.swc_bulk_file_format}"
\ No newline at end of file
+        return f"{self.swc_base_url} {self.swc_backoff} {self.swc_backoff_max_time}  {self.swc_bulk_file_format} {self.swc_timeout} {self.swc_max_connections} {self.swc_max_keepalive_connections} {self.swc_keepalive_expiry} {self.swc_cache_dir} {self.swc_cache_max_bytes}"
\ No newline at end of file
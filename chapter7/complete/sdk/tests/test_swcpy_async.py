@@ -0,0 +1,133 @@
+import asyncio
+import pytest
+from swcpy import AsyncSWCClient
+from swcpy import SWCConfig
+from swcpy.schemas import League, Team, Player, Performance, Counts
+
+"""Unit tests for the asyncio client of the SWC SDK
+
+    Tests the AsyncSWCClient against the SWC API at SWC_API_BASE_URL.
+
+Typical usage example:
+
+    pytest test_swcpy_async.py
+
+"""
+
+config = SWCConfig(backoff=False)
+
+
+def run_client(method_name: str, *args, **kwargs):
+    """Calls one client method in a new event loop and returns its result"""
+    async def call():
+        async with AsyncSWCClient(config) as client:
+            return await getattr(client, method_name)(*args, **kwargs)
+    return asyncio.run(call())
+
+
+def test_health_check():
+    """Tests health check from async SDK"""
+    response = run_client("get_health_check")
+    assert response.status_code == 200
+    assert response.json() == {"message": "API health check successful"}
+
+def test_list_leagues():
+    """Tests list leagues from async SDK"""
+    leagues_response = run_client("list_leagues")
+    assert len(leagues_response) == 5
+    for league in leagues_response:
+        assert isinstance(league, League)
+
+def test_get_league_by_id():
+    """Tests get league by ID from async SDK"""
+    league_response = run_client("get_league_by_id", 5002)
+    assert isinstance(league_response, League)
+    assert len(league_response.teams) == 8
+
+def test_get_counts():
+    """Tests get counts from async SDK"""
+    counts_response = run_client("get_counts")
+    assert isinstance(counts_response, Counts)
+    assert counts_response.league_count == 5
+    assert counts_response.team_count == 20
+    assert counts_response.player_count == 1018
+
+def test_list_teams():
+    """Tests list teams from async SDK"""
+    teams_response = run_client("list_teams", league_id=5001)
+    assert len(teams_response) == 12
+    for team in teams_response:
+        assert isinstance(team, Team)
+
+def test_list_players_by_name():
+    """Tests list players with filters from async SDK"""
+    players_response = run_client("list_players", first_name="Bryce", last_name="Young")
+    assert len(players_response) == 1
+    assert isinstance(players_response[0], Player)
+    assert players_response[0].player_id == 2009
+
+def test_list_performances():
+    """Tests list performances from async SDK"""
+    performances_response = run_client("list_performances", skip=0, limit=50)
+    assert len(performances_response) == 50
+    for performance in performances_response:
+        assert isinstance(performance, Performance)
+
+def test_concurrent_calls():
+    """Tests many calls in flight at once on one client"""
+    player_ids = list(range(1001, 1101))
+
+    async def get_players():
+        async with AsyncSWCClient(config) as client:
+            return await asyncio.gather(
+                *[client.get_player_by_id(player_id) for player_id in player_ids]
+            )
+
+    players_response = asyncio.run(get_players())
+    assert [player.player_id for player in players_response] == player_ids
+
+def test_iter_performances():
+    """Tests that the async performance iterator pages through every performance"""
+    async def get_performance_ids():
+        async with AsyncSWCClient(config) as client:
+            return [performance.performance_id
+                    async for performance in client.iter_performances(page_size=5000)]
+
+    performance_ids = asyncio.run(get_performance_ids())
+    assert len(performance_ids) == 17306
+    assert len(set(performance_ids)) == 17306
+
+def test_iter_teams():
+    """Tests the async team iterator with a page size that doesn't divide the teams"""
+    async def get_teams():
+        async with AsyncSWCClient(config) as client:
+            return [team async for team in client.iter_teams(page_size=7)]
+
+    teams_response = asyncio.run(get_teams())
+    assert len({team.team_id for team in teams_response}) == 20
+
+def test_fetch_all_performances():
+    """Tests that the async fetch_all returns every performance in order"""
+    async def fetch_all():
+        async with AsyncSWCClient(config) as client:
+            return await client.fetch_all("performances", page_size=2000, max_concurrency=4)
+
+    performance_ids = [performance.performance_id for performance in asyncio.run(fetch_all())]
+    assert len(performance_ids) == 17306
+    assert performance_ids == sorted(set(performance_ids))
+
+def test_page_size_must_be_positive():
+    """Tests that the async iterators and fetch_all reject an empty page size"""
+    async def iter_teams():
+        async with AsyncSWCClient(config) as client:
+            return [team async for team in client.iter_teams(page_size=0)]
+
+    with pytest.raises(ValueError):
+        asyncio.run(iter_teams())
+    with pytest.raises(ValueError):
+        run_client("fetch_all", "teams", page_size=0)
+
+def test_list_leagues_include_teams():
+    """Tests that the async client passes include through"""
+    leagues_response = run_client("list_leagues", include="teams")
+    assert sum(len(league.teams) for league in leagues_response) == 20
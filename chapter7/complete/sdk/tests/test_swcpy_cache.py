@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from swcpy import AsyncSWCClient
+from swcpy import SWCClient
+from swcpy import SWCConfig
+from swcpy.swc_cache import ResponseCache
+
+"""Unit tests for the response cache of the SWC SDK
+
+    Tests that cached responses are revalidated with the SWC API at
+    SWC_API_BASE_URL instead of downloaded again.
+
+Typical usage example:
+
+    pytest test_swcpy_cache.py
+
+"""
+
+
+def test_repeat_call_is_revalidated(tmp_path):
+    """Tests that a repeat call is answered from the cache after a 304"""
+    config = SWCConfig(backoff=False, cache_dir=str(tmp_path))
+    with SWCClient(config) as client:
+        first_leagues = client.list_leagues()
+        assert client.response_cache.hits == 0
+        second_leagues = client.list_leagues()
+        assert client.response_cache.hits == 1
+    assert second_leagues == first_leagues
+
+def test_cache_is_shared_between_clients(tmp_path):
+    """Tests that a new client revalidates what an earlier one cached"""
+    config = SWCConfig(backoff=False, cache_dir=str(tmp_path))
+    with SWCClient(config) as client:
+        first_team = client.list_teams(league_id=5001, limit=5)
+    with SWCClient(config) as client:
+        second_team = client.list_teams(limit=5, league_id=5001)
+        assert client.response_cache.hits == 1
+    assert second_team == first_team
+
+def test_response_without_validators_is_not_cached(tmp_path):
+    """Tests that the health check, which has no ETag, is always downloaded"""
+    config = SWCConfig(backoff=False, cache_dir=str(tmp_path))
+    with SWCClient(config) as client:
+        client.get_health_check()
+        client.get_health_check()
+        assert client.response_cache.hits == 0
+        assert client.response_cache.get(
+            ResponseCache.make_key(client.swc_base_url + client.HEALTH_CHECK_ENDPOINT)
+        ) is None
+
+def test_make_key_sorts_params():
+    """Tests that the order of the parameters doesn't change the key"""
+    assert ResponseCache.make_key("/v0/teams/", {"skip": 0, "league_id": 5001}) == \
+        ResponseCache.make_key("/v0/teams/", {"league_id": 5001, "skip": 0})
+
+def test_least_recently_used_is_evicted(tmp_path):
+    """Tests that the cache removes the least recently used response to fit"""
+    config = SWCConfig(backoff=False, cache_dir=str(tmp_path))
+    with SWCClient(config) as client:
+        client.get_league_by_id(5001)
+        client.get_league_by_id(5002)
+        league_key = ResponseCache.make_key(client.swc_base_url + "/v0/leagues/5001")
+        size = len(client.response_cache.get(league_key).content)
+
+    config = SWCConfig(backoff=False, cache_dir=str(tmp_path), cache_max_bytes=size + 1)
+    with SWCClient(config) as client:
+        client.get_league_by_id(5003)
+        assert client.response_cache.get(league_key) is None
+        client.get_league_by_id(5003)
+        assert client.response_cache.hits == 1
+
+def test_async_client_revalidates(tmp_path):
+    """Tests that the async client is answered from the cache after a 304"""
+    config = SWCConfig(backoff=False, cache_dir=str(tmp_path))
+
+    async def get_players_twice():
+        async with AsyncSWCClient(config) as client:
+            first_players = await client.list_players(limit=10)
+            second_players = await client.list_players(limit=10)
+            return first_players, second_players, client.response_cache.hits
+
+    first_players, second_players, hits = asyncio.run(get_players_twice())
+    assert hits == 1
+    assert second_players == first_players
@@ -1,3 +1,4 @@
+import httpx
 import pytest
 from swcpy import SWCClient
 from swcpy import SWCConfig
@@ -65,6 +66,28 @@ def test_list_leagues():
     # Asset that 5 League objects are returned
     assert len(leagues_response) == 5
 
+def test_client_reuses_connections():
+    """Tests that one client makes several calls over one connection and 
+    closes its pool"""
+    config = SWCConfig(backoff=False, max_connections=1, keepalive_expiry=30)
+    connections = []
+
+    def trace(event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            connections.append(info["return_value"])
+
+    def add_trace(request):
+        request.extensions["trace"] = trace
+
+    with SWCClient(config) as pooled_client:
+        pooled_client.http_client.event_hooks["request"].append(add_trace)
+        for _ in range(3):
+            response = pooled_client.get_health_check()
+            assert response.status_code == 200
+        assert not pooled_client.http_client.is_closed
+    assert pooled_client.http_client.is_closed
+    assert len(connections) == 1
+
 def test_list_leagues_no_backoff():
     """Tests get leagues from SDK without backoff"""
     client = SWCClient(config)    
@@ -319,3 +342,88 @@ def test_bulk_team_player_file():
 
     # Additional check: ensure the first row is the header
     assert rows[0] == ['team_id','player_id','last_changed_date']
+
+
+#paginating iterators
+def test_iter_performances():
+    """Tests that the performance iterator pages through every performance"""
+    performance_ids = [performance.performance_id
+                       for performance in client.iter_performances(page_size=5000)]
+    assert len(performance_ids) == 17306
+    assert len(set(performance_ids)) == 17306
+
+def test_iter_teams():
+    """Tests the team iterator with a page size that doesn't divide the teams"""
+    teams_response = list(client.iter_teams(page_size=7))
+    for team in teams_response:
+        assert isinstance(team, Team)
+    assert len({team.team_id for team in teams_response}) == 20
+
+def test_iter_players_by_name():
+    """Tests that the player iterator applies filters and stops on a short page"""
+    players_response = list(client.iter_players(first_name="Bryce", last_name="Young"))
+    assert [player.player_id for player in players_response] == [2009]
+
+def test_iter_leagues_stops_early():
+    """Tests that the caller can stop the iterator before the last page"""
+    leagues = client.iter_leagues(page_size=2)
+    assert [next(leagues).league_id for _ in range(3)] == [5001, 5002, 5003]
+    leagues.close()
+
+
+#parallel fetching
+def test_fetch_all_performances():
+    """Tests that fetch_all returns every performance in order"""
+    performances_response = client.fetch_all("performances", page_size=2000, max_concurrency=4)
+    performance_ids = [performance.performance_id for performance in performances_response]
+    assert len(performance_ids) == 17306
+    assert performance_ids == sorted(set(performance_ids))
+
+def test_fetch_all_teams():
+    """Tests fetch_all with a page size that doesn't divide the teams"""
+    teams_response = client.fetch_all("teams", page_size=7)
+    assert [team.team_id for team in teams_response] == [
+        team.team_id for team in client.list_teams()
+    ]
+
+def test_fetch_all_unknown_resource():
+    """Tests that fetch_all rejects a resource it can't page through"""
+    with pytest.raises(ValueError):
+        client.fetch_all("team_players")
+
+@pytest.mark.parametrize("page_size", [0, -1])
+def test_page_size_must_be_positive(page_size):
+    """Tests that the iterators and fetch_all reject an empty page size"""
+    with pytest.raises(ValueError):
+        list(client.iter_teams(page_size=page_size))
+    with pytest.raises(ValueError):
+        client.fetch_all("teams", page_size=page_size)
+
+def test_not_found_is_not_retried():
+    """Tests that a 404 is raised right away even with backoff"""
+    config = SWCConfig(backoff_max_time=30)
+    with SWCClient(config) as backoff_client:
+        with pytest.raises(httpx.HTTPStatusError) as error:
+            backoff_client.get_player_by_id(999999)
+    assert error.value.response.status_code == 404
+
+
+#nested lists
+def test_list_players_include_performances():
+    """Tests that performances are only returned when asked for"""
+    players_response = client.list_players(first_name="Bryce", last_name="Young")
+    assert players_response[0].performances == []
+    players_response = client.list_players(
+        first_name="Bryce", last_name="Young", include="performances")
+    assert len(players_response[0].performances) > 0
+
+def test_iter_teams_include_players():
+    """Tests that the team iterator passes include to every page"""
+    teams_response = list(client.iter_teams(page_size=7, include="players"))
+    assert len(teams_response) == 20
+    assert all(len(team.players) > 0 for team in teams_response)
+
+def test_fetch_all_leagues_include_teams():
+    """Tests that fetch_all passes include to every page"""
+    leagues_response = client.fetch_all("leagues", page_size=2, include="teams")
+    assert sum(len(league.teams) for league in leagues_response) == 20